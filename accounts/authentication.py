@@ -0,0 +1,104 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from django_project.cache import CacheStats, LRUCache
+
+
+class TokenCache:
+    """
+    The users of the recently used tokens, held in a per-process LRU with a TTL and, with
+    TOKEN_CACHE_SHARED, in the default cache to be shared by all the workers. Logout, password change
+    and deactivation evict the entries through signals; the TTL bounds how long the local LRU of the
+    other processes can keep an evicted token.
+
+    Only the user_fields are cached, never the password hash, and every get() builds a fresh
+    (user, token) pair, so no request sees the changes another one makes to its user. The other fields
+    of the user are deferred, so they are loaded when read and a save() doesn't blank them.
+    """
+    shared_key = 'auth-user:{key}'
+    user_fields = ('id', 'username', 'is_active', 'is_staff', 'is_superuser')
+
+    def __init__(self):
+        self.stats = CacheStats()
+        self._local = None
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'TOKEN_CACHE_TTL', 60)
+
+    @property
+    def local(self):
+        if self._local is None:
+            self._local = LRUCache(maxsize=getattr(settings, 'TOKEN_CACHE_SIZE', 10_000), ttl=self.ttl)
+        return self._local
+
+    @property
+    def shared(self):
+        return getattr(settings, 'TOKEN_CACHE_SHARED', False)
+
+    def get(self, key):
+        fields = self.local.get(key)
+        if fields is None and self.shared:
+            fields = cache.get(self.shared_key.format(key=key))
+            if fields is not None:
+                self.local.add(key, fields)
+        return self._credentials(key, fields)
+
+    async def aget(self, key):
+        fields = self.local.get(key)
+        if fields is None and self.shared:
+            fields = await cache.aget(self.shared_key.format(key=key))
+            if fields is not None:
+                self.local.add(key, fields)
+        return self._credentials(key, fields)
+
+    def _credentials(self, key, fields):
+        if fields is None:
+            self.stats.miss()
+            return None
+        self.stats.hit()
+        model, values = get_user_model(), dict(zip(self.user_fields, fields))
+        names = [field.attname for field in model._meta.concrete_fields if field.attname in values]  # from_db's order
+        user = model.from_db(None, names, [values[name] for name in names])
+        return user, Token(key=key, user=user)
+
+    def _fields(self, credentials):
+        user, _ = credentials
+        return tuple(getattr(user, field) for field in self.user_fields)
+
+    def add(self, key, credentials):
+        fields = self._fields(credentials)
+        self.local.add(key, fields)
+        if self.shared:
+            cache.set(self.shared_key.format(key=key), fields, timeout=self.ttl)
+
+    async def aadd(self, key, credentials):
+        fields = self._fields(credentials)
+        self.local.add(key, fields)
+        if self.shared:
+            await cache.aset(self.shared_key.format(key=key), fields, timeout=self.ttl)
+
+    def delete(self, key):
+        self.local.delete(key)
+        if self.shared:
+            cache.delete(self.shared_key.format(key=key))
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication which resolves warm tokens from the token cache instead of the database.
+    """
+
+    def authenticate_credentials(self, key):
+        credentials = token_cache.get(key)
+        if credentials is None:
+            credentials = super().authenticate_credentials(key)
+            token_cache.add(key, credentials)
+        return credentials
@@ -0,0 +1,30 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from accounts.authentication import CachedTokenAuthentication, token_cache
+from survey.benchmark import measure, rolled_back
+
+
+class Command(BaseCommand):
+    help = 'Compare the time and queries TokenAuthentication and CachedTokenAuthentication add to a request.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            user = get_user_model().objects.create_user(username='benchmark-token-user')
+            token = Token.objects.create(user=user)
+            request = RequestFactory().get('/', headers={'authorization': f'Token {token.key}'})
+
+            token_cache.delete(token.key)
+            CachedTokenAuthentication().authenticate(request)  # warm up the cache
+            for name, authentication in (('TokenAuthentication', TokenAuthentication()),
+                                         ('CachedTokenAuthentication (warm)', CachedTokenAuthentication())):
+                result = measure(name, lambda: authentication.authenticate(request), repeat=options['repeat'])
+                self.stdout.write(str(result))
+            token_cache.delete(token.key)
@@ -1,3 +1,56 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import override_settings
 
-# Create your tests here.
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from .authentication import token_cache
+
+
+class CachedTokenAuthenticationTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        token_cache.local.clear()
+        self.user = get_user_model().objects.create_user(username='user', password='password')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_warm_token_adds_no_queries(self):
+        self.client.get('/survey/my-survey/')
+        with self.assertNumQueries(1):  # only the surveys of the user
+            response = self.client.get('/survey/my-survey/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_logout_evicts_token(self):
+        self.client.get('/survey/my-survey/')
+        self.client.post('/accounts/logout/')
+        self.assertEqual(self.client.get('/survey/my-survey/').status_code, 401)
+
+    def test_deactivation_evicts_token(self):
+        self.client.get('/survey/my-survey/')
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/survey/my-survey/').status_code, 401)
+
+    @override_settings(TOKEN_CACHE_SHARED=True)
+    def test_cached_users_are_fresh_and_without_password(self):
+        token_cache.add(self.token.key, (self.user, self.token))
+        self.assertNotIn(self.user.password, repr(cache.get(token_cache.shared_key.format(key=self.token.key))))
+        first, _ = token_cache.get(self.token.key)
+        first.username = 'changed'
+        second, token = token_cache.get(self.token.key)
+        self.assertIsNot(first, second)
+        self.assertEqual((second.pk, second.username, token.key), (self.user.pk, 'user', self.token.key))
+
+    def test_cached_user_loads_and_keeps_the_other_fields(self):
+        get_user_model().objects.filter(pk=self.user.pk).update(email='user@example.com')
+        token_cache.add(self.token.key, (self.user, self.token))
+        user, _ = token_cache.get(self.token.key)
+        self.assertFalse(user._state.adding)
+        self.assertEqual(user.email, 'user@example.com')
+        user.first_name = 'First'
+        user.save()
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.first_name, self.user.email), ('First', 'user@example.com'))
+        self.assertTrue(self.user.check_password('password'))
@@ -0,0 +1,221 @@
+"""
+Per-request instrumentation: query count, DB time, serializer time, total time and response size.
+
+InstrumentationMiddleware measures a sample of the requests (INSTRUMENTATION_SAMPLE_RATE), reports
+them in a Server-Timing header and adds them to per-process histograms keyed by the URL name (or the
+view path of unnamed URLs), see endpoint_metrics.report(). pool_stats() reports the connection pools.
+
+Queries are counted with connection.execute_wrapper, so the queries of async views, which run in the
+thread of sync_to_async, are not seen. The serializer time covers the serializers which inherit
+TimedSerializerMixin.
+"""
+import math
+import random
+import threading
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from django.conf import settings
+from django.db import connections
+
+_current = ContextVar('request_timings', default=None)
+
+
+class Histogram:
+    """
+    Thread safe histogram whose buckets grow by 10%, so the percentiles are within 10% at any scale.
+    """
+    growth = 1.1
+    zero = -1000  # bucket of the values <= 0
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        index = math.ceil(math.log(value, self.growth)) if value > 0 else self.zero
+        with self._lock:
+            self.buckets[index] = self.buckets.get(index, 0) + 1
+            self.count += 1
+            self.total += value
+            self.max = max(self.max, value)
+
+    def percentile(self, q):
+        """
+        Upper bound of the bucket of the q-th (0-100) percentile.
+        """
+        with self._lock:
+            buckets = sorted(self.buckets.items())
+        rank = q / 100 * self.count
+        seen = 0
+        for index, count in buckets:
+            seen += count
+            if seen >= rank:
+                return 0.0 if index == self.zero else min(self.growth ** index, self.max)
+        return self.max
+
+    def as_dict(self):
+        return {
+            'mean': self.total / self.count if self.count else 0.0,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'max': self.max,
+        }
+
+
+class EndpointMetrics:
+    """
+    Histograms of every metric of every endpoint in this process.
+    """
+    metrics = ('total_ms', 'db_ms', 'serializer_ms', 'queries', 'size')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.endpoints = {}
+
+    def add(self, name, **values):
+        histograms = self.endpoints.get(name)
+        if histograms is None:
+            with self._lock:
+                histograms = self.endpoints.setdefault(name, {metric: Histogram() for metric in self.metrics})
+        for metric, value in values.items():
+            if value is not None:
+                histograms[metric].add(value)
+
+    def report(self):
+        return {name: {'requests': histograms['total_ms'].count,
+                       **{metric: histogram.as_dict() for metric, histogram in histograms.items()}}
+                for name, histograms in sorted(self.endpoints.items())}
+
+    def clear(self):
+        with self._lock:
+            self.endpoints = {}
+
+
+endpoint_metrics = EndpointMetrics()
+
+
+def pool_stats():
+    """
+    Usage of the connection pool of every pooled database (DATABASE_POOL) in this process.
+    """
+    stats = {}
+    for connection in connections.all():
+        pool = getattr(connection, 'pool', None)
+        if pool is None:
+            continue
+        current = pool.get_stats()
+        requests = current.get('requests_num', 0)
+        stats[connection.alias] = {
+            'size': current.get('pool_size', 0),
+            'in_use': current.get('pool_size', 0) - current.get('pool_available', 0),
+            'waiting': current.get('requests_waiting', 0),
+            'requests': requests,
+            'wait_ms_total': current.get('requests_wait_ms', 0),
+            'wait_ms_mean': current.get('requests_wait_ms', 0) / requests if requests else 0.0,
+            'timeouts': current.get('requests_errors', 0),
+        }
+    return stats
+
+
+class RequestTimings:
+    """
+    Timings of one request, which also counts the queries as an execute_wrapper.
+    """
+    __slots__ = ('queries', 'db', 'serializer', 'depth')
+
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        self.serializer = 0.0
+        self.depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db += time.perf_counter() - start
+
+
+class TimedSerializerMixin:
+    """
+    Adds the time spent in to_representation to the serializer time of the measured request;
+    nested serializers are counted once, by the outermost one.
+    """
+
+    def to_representation(self, instance):
+        timings = _current.get()
+        if timings is None or timings.depth:
+            return super().to_representation(instance)
+        timings.depth += 1
+        start = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            timings.serializer += time.perf_counter() - start
+            timings.depth -= 1
+
+
+class InstrumentationMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def is_sampled(self):
+        return random.random() < getattr(settings, 'INSTRUMENTATION_SAMPLE_RATE', 0.0)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.is_sampled():
+            return self.get_response(request)
+        timings = RequestTimings()
+        token = _current.set(timings)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timings))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timings, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        if not self.is_sampled():
+            return await self.get_response(request)
+        timings = RequestTimings()
+        token = _current.set(timings)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timings, time.perf_counter() - start, queries=False)
+
+    def finish(self, request, response, timings, duration, queries=True):
+        match = request.resolver_match
+        size = None if response.streaming else len(response.content)
+        endpoint_metrics.add(match.view_name if match else '<unresolved>', total_ms=duration * 1000,
+                             db_ms=timings.db * 1000 if queries else None,
+                             serializer_ms=timings.serializer * 1000,
+                             queries=timings.queries if queries else None, size=size)
+        if getattr(settings, 'INSTRUMENTATION_SERVER_TIMING', True):
+            metrics = [f'total;dur={duration * 1000:.2f}', f'serializer;dur={timings.serializer * 1000:.2f}']
+            if queries:
+                metrics.append(f'db;dur={timings.db * 1000:.2f};desc="{timings.queries} queries"')
+            response['Server-Timing'] = ', '.join(metrics)
+        return response
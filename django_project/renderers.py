@@ -0,0 +1,49 @@
+"""
+JSON renderer and parser on orjson, which encodes plain dicts and lists straight to bytes several times
+faster than the json module. Without orjson installed they fall back to the stdlib based classes of DRF.
+"""
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_encoder = JSONEncoder()  # for the types orjson doesn't know, e.g. Decimal and lazy strings, and the datetimes
+
+
+def dumps(data):
+    """
+    The data as compact UTF-8 JSON bytes, like FastJSONRenderer renders it.
+    """
+    if orjson is None:
+        return JSONRenderer().render(data)
+    # the datetimes go through DRF's encoder too, which writes UTC as Z where orjson writes +00:00
+    content = orjson.dumps(data, default=_encoder.default,
+                           option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME)
+    # like DRF, escape the separators which are valid JSON but not valid JavaScript
+    return content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type=accepted_media_type, renderer_context=renderer_context)
+        return dumps(data)
+
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type=media_type, parser_context=parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
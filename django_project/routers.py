@@ -0,0 +1,126 @@
+"""
+Optional read replica (DATABASE_REPLICA_URL) for the reads of the survey app.
+
+ReplicaRouter sends a survey read to the replica unless it has to see the latest writes:
+- inside a transaction on the primary, or within use_primary(),
+- during a request which writes (any method but GET, HEAD and OPTIONS), e.g. the submit with its
+  "already passed" check,
+- for DATABASE_REPLICA_PIN_SECONDS after a successful write of the same user, so users read their own
+  writes despite the replication lag. ReplicaPinningMiddleware keeps this state.
+Writes always go to the primary.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA = 'replica'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_primary = ContextVar('use_primary', default=False)
+_request = ContextVar('replica_request', default=None)
+
+
+@contextmanager
+def use_primary():
+    token = _primary.set(True)
+    try:
+        yield
+    finally:
+        _primary.reset(token)
+
+
+def pin_key(user_id):
+    return f'replica-pin:{user_id}'
+
+
+def is_pinned(request):
+    """
+    Whether the user of the request wrote within the pin window, looked up once per request. Anonymous
+    users can't write.
+    """
+    pinned = getattr(request, '_replica_pinned', None)
+    if pinned is None:
+        user = getattr(request, 'user', None)
+        if user is None or not user.is_authenticated:
+            return False
+        pinned = request._replica_pinned = cache.get(pin_key(user.pk), False)
+    return pinned
+
+
+class ReplicaRouter:
+    route_app_labels = {'survey'}
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label not in self.route_app_labels:
+            return None
+        if REPLICA not in connections.settings or _primary.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        request = _request.get()
+        if request is not None and is_pinned(request):
+            return DEFAULT_DB_ALIAS
+        return REPLICA
+
+    def db_for_write(self, model, **hints):
+        # explicitly, otherwise objects read from the replica would be saved back to it
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, REPLICA}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return False if db == REPLICA else None
+
+
+class ReplicaPinningMiddleware:
+    """
+    Keeps the reads of the requests which write, and of their users for a while afterwards, on the primary.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        tokens = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            self.finish(tokens)
+        self.pin(request, response)
+        return response
+
+    async def __acall__(self, request):
+        tokens = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            self.finish(tokens)
+        self.pin(request, response)
+        return response
+
+    def start(self, request):
+        return _request.set(request), _primary.set(_primary.get() or request.method not in SAFE_METHODS)
+
+    def finish(self, tokens):
+        request_token, primary_token = tokens
+        _primary.reset(primary_token)
+        _request.reset(request_token)
+
+    def pin(self, request, response):
+        if REPLICA not in connections.settings or request.method in SAFE_METHODS or response.status_code >= 400:
+            return
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            cache.set(pin_key(user.pk), True, timeout=getattr(settings, 'DATABASE_REPLICA_PIN_SECONDS', 5))
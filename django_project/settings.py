@@ -30,6 +30,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     # 3rd part
     'whitenoise.runserver_nostatic',
     'corsheaders',
@@ -41,6 +42,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'django_project.instrumentation.InstrumentationMiddleware',
+    'django_project.routers.ReplicaPinningMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -78,6 +81,37 @@ WSGI_APPLICATION = 'django_project.wsgi.application'
 DATABASES = {
     'default': env.dj_db_url('DATABASE_URL')
 }
+if env.str('DATABASE_REPLICA_URL', default=''):
+    # read-only replica for the survey reads, see django_project/routers.py
+    DATABASES['replica'] = env.dj_db_url('DATABASE_REPLICA_URL')
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+for database in DATABASES.values():
+    if env.bool('DATABASE_POOL', default=False):
+        # psycopg_pool connections shared by the threads of a worker, only with CONN_MAX_AGE=0
+        database.setdefault('OPTIONS', {})['pool'] = {
+            'min_size': env.int('DATABASE_POOL_MIN_SIZE', default=2),
+            'max_size': env.int('DATABASE_POOL_MAX_SIZE', default=10),
+            'timeout': env.float('DATABASE_POOL_TIMEOUT', default=10.0),  # seconds to wait for a connection
+            'max_idle': env.float('DATABASE_POOL_MAX_IDLE', default=600.0),
+            'max_lifetime': env.float('DATABASE_POOL_MAX_LIFETIME', default=3600.0),
+        }
+    else:
+        # seconds a connection is kept open across requests, 0 closes it after every request
+        database['CONN_MAX_AGE'] = env.int('DATABASE_CONN_MAX_AGE', default=0)
+        database['CONN_HEALTH_CHECKS'] = env.bool('DATABASE_CONN_HEALTH_CHECKS', default=True)
+
+DATABASE_ROUTERS = ['django_project.routers.ReplicaRouter']
+# seconds the reads of a user stay on the primary after the user's write
+DATABASE_REPLICA_PIN_SECONDS = env.int('DATABASE_REPLICA_PIN_SECONDS', default=5)
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# locmem by default, e.g. CACHE_URL=redis://redis:6379/0 for a cache shared by all the workers
+
+CACHES = {
+    'default': env.dj_cache_url('CACHE_URL', default='locmem://')
+}
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -123,6 +157,36 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # rest framework
 
 REST_FRAMEWORK = {'DEFAULT_AUTHENTICATION_CLASSES': [
-    'rest_framework.authentication.TokenAuthentication'
-]
+    'accounts.authentication.CachedTokenAuthentication'
+],
+    'DEFAULT_RENDERER_CLASSES': [
+        'django_project.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'django_project.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
+
+# instrumentation
+
+# share of the requests measured by the instrumentation middleware, see django_project/instrumentation.py
+INSTRUMENTATION_SAMPLE_RATE = env.float('INSTRUMENTATION_SAMPLE_RATE', default=0.1)
+INSTRUMENTATION_SERVER_TIMING = env.bool('INSTRUMENTATION_SERVER_TIMING', default=True)
+
+TOKEN_CACHE_TTL = env.int('TOKEN_CACHE_TTL', default=60)
+TOKEN_CACHE_SIZE = env.int('TOKEN_CACHE_SIZE', default=10_000)
+TOKEN_CACHE_SHARED = env.bool('TOKEN_CACHE_SHARED', default=False)
+
+# survey
+
+SURVEY_DETAIL_CACHE_TIMEOUT = env.int('SURVEY_DETAIL_CACHE_TIMEOUT', default=60 * 60 * 24)
+# cap of the survey caches in a locmem cache, which doesn't see the invalidations of the other workers
+SURVEY_LOCAL_CACHE_TIMEOUT = env.int('SURVEY_LOCAL_CACHE_TIMEOUT', default=5)
+SURVEY_PASSED_CACHE_SIZE = env.int('SURVEY_PASSED_CACHE_SIZE', default=100_000)
+SURVEY_PASSED_CACHE_SHARED = env.bool('SURVEY_PASSED_CACHE_SHARED', default=False)
+SURVEY_PASSED_CACHE_TIMEOUT = env.int('SURVEY_PASSED_CACHE_TIMEOUT', default=60 * 60 * 24 * 7)
+# accept submissions into an outbox table, stored in batches by `manage.py drain_submissions`
+SURVEY_ASYNC_INGEST = env.bool('SURVEY_ASYNC_INGEST', default=False)
@@ -1,29 +1,119 @@
 from django.contrib import admin
+from django.forms.models import BaseInlineFormSet
 
-from .models import Question, Survey, Answer
+from .models import Question, Survey, Answer, SurveyPurge, count_of
+from .purge import mark_deleted, purge_answers, purge_questions
+
+
+class CappedInlineFormSet(BaseInlineFormSet):
+    """
+    Shows only the first max_shown related rows, so a survey with thousands of questions still opens;
+    the rest are edited from their own change pages. Deleted rows go through the purges of purge.py.
+    """
+    max_shown = 50
+    purges = {Question: purge_questions, Answer: purge_answers}
+
+    def get_queryset(self):
+        if not hasattr(self, '_queryset'):
+            self._queryset = super().get_queryset()[:self.max_shown]
+        return self._queryset
+
+    def delete_existing(self, obj, commit=True):
+        if commit:
+            self.purges[self.model](self.model.objects.filter(pk=obj.pk))
+
+
+class PurgedDeleteMixin:
+    """
+    Deletes through the batched purges of purge.py, so the rows of the cascade are neither collected
+    for the confirmation page nor loaded to be deleted.
+    """
+
+    def get_deleted_objects(self, objs, request):
+        objs = list(objs)
+        perms_needed = set() if self.has_delete_permission(request) else {self.opts.verbose_name}
+        return [str(obj) for obj in objs], {self.opts.verbose_name_plural: len(objs)}, perms_needed, []
+
+    def delete_model(self, request, obj):
+        self.delete_queryset(request, self.model.objects.filter(pk=obj.pk))
 
 
 class AnswerInline(admin.TabularInline):
     model = Answer
+    formset = CappedInlineFormSet
+    readonly_fields = ['answered_count', ]
 
 
 class QuestionInlines(admin.TabularInline):
     model = Question
+    formset = CappedInlineFormSet
     readonly_fields = ['pk', ]
+    show_change_link = True
+
 
 @admin.register(Answer)
-class AnswerAdmin(admin.ModelAdmin):
-    list_display = ['pk', 'answer']
+class AnswerAdmin(PurgedDeleteMixin, admin.ModelAdmin):
+    list_display = ['pk', 'answer', 'question', 'answered_count']
+    list_select_related = ['question']
+    list_filter = ['question__survey__published', 'question__question_type']
+    search_fields = ['answer']
+    autocomplete_fields = ['question']
+    readonly_fields = ['answered_count']
+    show_full_result_count = False
+
+    def delete_queryset(self, request, queryset):
+        purge_answers(answers=queryset)
 
 
 @admin.register(Question)
-class QuestionAdmin(admin.ModelAdmin):
-    list_display = ['pk', 'question', 'survey']
+class QuestionAdmin(PurgedDeleteMixin, admin.ModelAdmin):
+    list_display = ['pk', 'question', 'survey', 'question_type', 'answer_count']
+    list_select_related = ['survey']
+    list_filter = ['question_type']
+    search_fields = ['question']
+    autocomplete_fields = ['survey']
+    show_full_result_count = False
     inlines = [AnswerInline, ]
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(answer_count=count_of(Answer, 'question'))
+
+    @admin.display(description='answers')
+    def answer_count(self, obj):
+        return obj.answer_count
+
+    def delete_queryset(self, request, queryset):
+        purge_questions(questions=queryset)
+
 
 @admin.register(Survey)
-class SurveyAdmin(admin.ModelAdmin):
-    list_display = ['title', 'slug', 'published']
+class SurveyAdmin(PurgedDeleteMixin, admin.ModelAdmin):
+    list_display = ['title', 'slug', 'owner', 'published', 'question_count', 'passed_count', 'created_at']
+    list_select_related = ['owner']
+    list_filter = ['published']
+    search_fields = ['title']
+    autocomplete_fields = ['owner']
+    readonly_fields = ['passed_count']
     exclude = ['slug', 'created_at']
+    show_full_result_count = False
     inlines = [QuestionInlines, ]
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(question_count=count_of(Question, 'survey'))
+
+    @admin.display(description='questions')
+    def question_count(self, obj):
+        return obj.question_count
+
+    def delete_model(self, request, obj):
+        mark_deleted(survey=obj)
+
+    def delete_queryset(self, request, queryset):
+        for survey in queryset:
+            mark_deleted(survey=survey)
+
+
+@admin.register(SurveyPurge)
+class SurveyPurgeAdmin(admin.ModelAdmin):
+    list_display = ['title', 'requested_at', 'step', 'deleted_rows', 'finished_at']
+    readonly_fields = ['survey_id', 'title', 'requested_at', 'step', 'deleted_rows', 'finished_at']
@@ -0,0 +1,104 @@
+"""
+Async variants of the read-heavy endpoints. They run on Django's async ORM, so under an ASGI server
+(uvicorn django_project.asgi:application) one worker serves many concurrent slow clients.
+"""
+from asgiref.sync import sync_to_async
+
+from django.http import HttpResponse, JsonResponse
+from django.views import View
+
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+
+from accounts.authentication import token_cache
+from django_project.renderers import dumps
+from django_project.routers import use_primary
+
+import survey.serializers as serializers
+
+from .cache import survey_detail_cache
+from .models import Survey
+from .pagination import SurveyCursorPagination
+from .schema import load_schema
+from .views import QUESTION_TREE
+
+
+class AsyncTokenAuthenticationMixin:
+    """
+    The async counterpart of TokenAuthentication + IsAuthenticated.
+    """
+    authentication_required = True
+    keyword = 'Token'
+
+    async def authenticate(self, request):
+        auth = request.headers.get('Authorization', '').split()
+        if len(auth) != 2 or auth[0].lower() != self.keyword.lower():
+            return None
+        credentials = await token_cache.aget(auth[1])
+        if credentials is None:
+            try:
+                token = await Token.objects.select_related('user').aget(key=auth[1])
+            except Token.DoesNotExist:
+                return None
+            if not token.user.is_active:
+                return None
+            credentials = (token.user, token)
+            await token_cache.aadd(auth[1], credentials)
+        return credentials[0]
+
+    async def dispatch(self, request, *args, **kwargs):
+        request.user = await self.authenticate(request)
+        if self.authentication_required and request.user is None:
+            response = JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+            response['WWW-Authenticate'] = self.keyword
+            return response
+        return await super().dispatch(request, *args, **kwargs)
+
+
+class AsyncSurveyListView(AsyncTokenAuthenticationMixin, View):
+    """
+    Published surveys in the keyset pages of SurveyCursorPagination, whose cursors work on both lists.
+    """
+    authentication_required = False
+    list_fields = ('id', 'title', 'slug', 'created_at')
+
+    async def get(self, request, *args, **kwargs):
+        include_description = 'description' in request.GET.getlist('include')
+        fields = self.list_fields + ('description',) if include_description else self.list_fields
+        paginator = SurveyCursorPagination()
+        try:
+            queryset = paginator.page_queryset(Survey.is_published.only(*fields), Request(request))
+        except NotFound as exc:
+            return JsonResponse({'detail': exc.detail}, status=404)
+        page = paginator.set_page([survey async for survey in queryset.aiterator()])
+        results = serializers.SurveyListReadSerializer(page, many=True,
+                                                       context={'include_description': include_description}).data
+        return HttpResponse(dumps(paginator.get_paginated_response(results).data), content_type='application/json')
+
+
+class AsyncSurveyDetailView(AsyncTokenAuthenticationMixin, View):
+    async def get(self, request, slug, *args, **kwargs):
+        version = await survey_detail_cache.aget_version(slug=slug)
+        entry = await survey_detail_cache.aget(slug=slug, version=version)
+        if entry is None:
+            try:
+                with use_primary():  # see SurveyDetailAPIView.get_validators
+                    survey = await Survey.is_published.aget(slug=slug)
+                    schema = await sync_to_async(load_schema)(survey=survey)  # may compile a missing schema
+            except Survey.DoesNotExist:
+                return JsonResponse({'detail': 'Not found.'}, status=404)
+            entry = (survey.changed_at, dumps(schema.detail))
+            await survey_detail_cache.aset(slug=slug, version=version, content=entry)
+        _, content = entry
+        return HttpResponse(content, content_type='application/json')
+
+
+class AsyncShowStatisticOfSurveyView(AsyncTokenAuthenticationMixin, View):
+    async def get(self, request, slug, *args, **kwargs):
+        try:
+            survey = await Survey.objects.prefetch_related(QUESTION_TREE).aget(slug=slug)
+        except Survey.DoesNotExist:
+            return JsonResponse({'detail': 'Not found.'}, status=404)
+        return HttpResponse(dumps(serializers.SurveyStatisticReadSerializer(survey).data),
+                            content_type='application/json')
@@ -0,0 +1,208 @@
+import json
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .models import Survey, Question, Answer, Submission, Selection
+from accounts.authentication import token_cache
+
+from .cache import passed_survey_cache
+from .schema import compile_schema
+from .search import update_search_vectors
+
+
+class Measurement:
+    """
+    Wall time (in milliseconds) and query count of repeated runs of the same operation.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.timings = []
+        self.queries = 0
+
+    def percentile(self, percent):
+        timings = sorted(self.timings)
+        return timings[min(len(timings) - 1, int(len(timings) * percent / 100))]
+
+    @property
+    def p50(self):
+        return self.percentile(50)
+
+    @property
+    def p99(self):
+        return self.percentile(99)
+
+    @property
+    def throughput(self):
+        return len(self.timings) / (sum(self.timings) / 1000)
+
+    def as_dict(self):
+        return {'p50': self.p50, 'p99': self.p99, 'throughput': self.throughput, 'queries': self.queries}
+
+    def __str__(self):
+        return (f'{self.name:<48} p50 {self.p50:8.2f} ms  p99 {self.p99:8.2f} ms  '
+                f'{self.throughput:8.1f} op/s  {self.queries:4d} queries')
+
+
+def measure(name, func, repeat=20):
+    measurement = Measurement(name)
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            func()
+            measurement.timings.append((time.perf_counter() - start) * 1000)
+        measurement.queries = len(context)
+    return measurement
+
+
+def save_baseline(path, measurements):
+    with open(path, 'w') as file:
+        json.dump({measurement.name: measurement.as_dict() for measurement in measurements}, file, indent=2)
+
+
+def compare_with_baseline(path, measurements, tolerance):
+    """
+    Regressions of the measurements against the saved baseline: any extra query, or a p50 slower than
+    the baseline by more than the tolerance (0.5 = 50%).
+    """
+    with open(path) as file:
+        baseline = json.load(file)
+    regressions = []
+    for measurement in measurements:
+        saved = baseline.get(measurement.name)
+        if saved is None:
+            continue
+        if measurement.queries > saved['queries']:
+            regressions.append(f'{measurement.name}: {measurement.queries} queries, baseline {saved["queries"]}')
+        if measurement.p50 > saved['p50'] * (1 + tolerance):
+            regressions.append(f'{measurement.name}: p50 {measurement.p50:.2f} ms, baseline {saved["p50"]:.2f} ms')
+    return regressions
+
+
+class BenchmarkCommand(BaseCommand):
+    """
+    Command which writes synthetic data, refused with DEBUG off unless --allow-database is passed, so it
+    doesn't run against a production database by accident.
+    """
+
+    def create_parser(self, prog_name, subcommand, **kwargs):
+        parser = super().create_parser(prog_name, subcommand, **kwargs)
+        parser.add_argument('--allow-database', action='store_true',
+                            help='Write to the configured database even with DEBUG off.')
+        return parser
+
+    def execute(self, *args, **options):
+        if not settings.DEBUG and not options.get('allow_database'):
+            raise CommandError(f'Refusing to write benchmark data to the database "{connection.settings_dict["NAME"]}" '
+                               f'with DEBUG off, pass --allow-database to do it anyway.')
+        return super().execute(*args, **options)
+
+
+class Rollback(Exception):
+    pass
+
+
+def _clear_local_caches():
+    for local_cache in (passed_survey_cache, token_cache):
+        local_cache._local = None
+
+
+@contextmanager
+def rolled_back():
+    """
+    Run the benchmark inside a transaction which is rolled back, so its data never stays in the database.
+    The shared cache gets a key prefix of its own and the per-process caches are emptied, so no cache
+    entry about the rolled back rows, whose ids are reused later, outlives the benchmark.
+    """
+    caches = {alias: {**config, 'KEY_PREFIX': f'{config.get("KEY_PREFIX", "")}benchmark-{uuid.uuid4().hex}'}
+              for alias, config in settings.CACHES.items()}
+    _clear_local_caches()
+    try:
+        with override_settings(CACHES=caches), transaction.atomic():
+            yield
+            raise Rollback
+    except Rollback:
+        pass
+    finally:
+        _clear_local_caches()
+
+
+def analyze():
+    """
+    Refresh the planner statistics, which don't see the rows bulk created in the open transaction otherwise.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def make_surveys(owner, count, published=True, batch_size=5000, prefix='Benchmark survey'):
+    surveys = [Survey(owner=owner, title=f'{prefix} {number}', slug=slugify(f'{prefix} {number}'),
+                      description='Description ' * 20, published=published) for number in range(count)]
+    return Survey.objects.bulk_create(surveys, batch_size=batch_size)
+
+
+def make_question_tree(surveys, questions, answers):
+    """
+    Give every survey the number of questions with the number of answers each.
+    """
+    created = Question.objects.bulk_create([Question(survey=survey, question=f'Question {number}')
+                                            for survey in surveys for number in range(questions)], batch_size=5000)
+    Answer.objects.bulk_create([Answer(question=question, answer=f'Answer {number}')
+                                for question in created for number in range(answers)], batch_size=5000)
+    return created
+
+
+def make_users(count, prefix='benchmark-user', batch_size=5000):
+    users = [get_user_model()(username=f'{prefix}-{number}') for number in range(count)]
+    return get_user_model().objects.bulk_create(users, batch_size=batch_size)
+
+
+def make_submissions(survey, users, seed=0, batch_size=10000):
+    """
+    One submission of the survey per user, choosing a random answer to every question, spread over
+    the last 30 days. Counters are not updated, run rebuild_survey_counters when they matter.
+    """
+    rng = random.Random(seed)
+    questions = {}
+    for pk, question_id in Answer.objects.filter(question__survey=survey).values_list('pk', 'question_id'):
+        questions.setdefault(question_id, []).append(pk)
+    now = timezone.now()
+    submissions = Submission.objects.bulk_create(
+        [Submission(survey=survey, user=user, submitted_at=now - timedelta(seconds=rng.randrange(30 * 24 * 3600)))
+         for user in users], batch_size=batch_size)
+    for start in range(0, len(submissions), batch_size):
+        Selection.objects.bulk_create(
+            [Selection(submission=submission, question_id=question, answer_id=rng.choice(answers))
+             for submission in submissions[start:start + batch_size] for question, answers in questions.items()],
+            batch_size=batch_size)
+    return submissions
+
+
+def make_dataset(users, surveys, questions, answers, submissions, seed=0, prefix='Synthetic'):
+    """
+    An owner with the number of published surveys, each with its question tree and submissions by a random
+    sample of the users. Returns (owner, users, surveys); counters are not updated.
+    """
+    rng = random.Random(seed)
+    owner = get_user_model().objects.create_user(username=f'{slugify(prefix)}-owner')
+    people = make_users(count=users, prefix=f'{slugify(prefix)}-user')
+    created = make_surveys(owner=owner, count=surveys, prefix=f'{prefix} survey')
+    make_question_tree(surveys=created, questions=questions, answers=answers)
+    for number, survey in enumerate(created):
+        survey.schema = compile_schema(survey=survey)
+        make_submissions(survey=survey, users=rng.sample(people, min(submissions, len(people))), seed=seed + number)
+    Survey.objects.bulk_update(created, ['schema'], batch_size=1000)
+    update_search_vectors(Survey.objects.filter(owner=owner))
+    return owner, people, created
@@ -0,0 +1,128 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+
+from django_project.cache import CacheStats, LRUCache
+
+
+class SurveyVersionCache:
+    """
+    Data built from a survey, e.g. its serialized detail page, keyed by the survey slug and a version
+    stamp which is shared by all the caches of the survey.
+
+    Invalidation replaces the version stamp instead of deleting entries: the old entries are never read
+    again and simply expire. The stamp is a timestamp rather than a counter, so an evicted stamp can't
+    bring an outdated entry back to life.
+
+    A locmem cache is private to each worker process, which never sees the invalidations of the others,
+    so there the stamps and entries expire after SURVEY_LOCAL_CACHE_TIMEOUT seconds.
+    """
+    version_key = 'survey-version:{slug}'
+    content_key = '{name}:{slug}:{version}'
+
+    def __init__(self, name):
+        self.name = name
+        self.stats = CacheStats()
+
+    @property
+    def version_timeout(self):
+        if isinstance(caches['default'], LocMemCache):
+            return getattr(settings, 'SURVEY_LOCAL_CACHE_TIMEOUT', 5)
+        return None
+
+    @property
+    def timeout(self):
+        timeout = getattr(settings, 'SURVEY_DETAIL_CACHE_TIMEOUT', 60 * 60 * 24)
+        version_timeout = self.version_timeout
+        return timeout if version_timeout is None else min(timeout, version_timeout)
+
+    def get_version(self, slug):
+        key = self.version_key.format(slug=slug)
+        version = cache.get(key)
+        if version is None:
+            cache.add(key, time.time_ns(), timeout=self.version_timeout)
+            version = cache.get(key)
+        return version
+
+    async def aget_version(self, slug):
+        key = self.version_key.format(slug=slug)
+        version = await cache.aget(key)
+        if version is None:
+            await cache.aadd(key, time.time_ns(), timeout=self.version_timeout)
+            version = await cache.aget(key)
+        return version
+
+    def get(self, slug, version):
+        return self._count(cache.get(self.content_key.format(name=self.name, slug=slug, version=version)))
+
+    async def aget(self, slug, version):
+        return self._count(await cache.aget(self.content_key.format(name=self.name, slug=slug, version=version)))
+
+    def _count(self, content):
+        if content is None:
+            self.stats.miss()
+        else:
+            self.stats.hit()
+        return content
+
+    def set(self, slug, version, content):
+        cache.set(self.content_key.format(name=self.name, slug=slug, version=version), content,
+                  timeout=self.timeout)
+
+    async def aset(self, slug, version, content):
+        await cache.aset(self.content_key.format(name=self.name, slug=slug, version=version), content,
+                         timeout=self.timeout)
+
+    def invalidate(self, slug):
+        cache.set(self.version_key.format(slug=slug), time.time_ns(), timeout=self.version_timeout)
+
+
+class PassedSurveyCache:
+    """
+    (survey id, user id) pairs of the users who have already passed a survey, so repeated submits
+    are rejected without a query. Submissions are never removed while the survey exists and ids are
+    never reused, so the pairs don't need any invalidation.
+
+    The pairs live in a per-process LRU and, with SURVEY_PASSED_CACHE_SHARED, also in the default
+    cache to be shared by all the workers.
+    """
+    shared_key = 'survey-passed:{survey_id}:{user_id}'
+
+    def __init__(self):
+        self.stats = CacheStats()
+        self._local = None
+
+    @property
+    def local(self):
+        if self._local is None:
+            self._local = LRUCache(maxsize=getattr(settings, 'SURVEY_PASSED_CACHE_SIZE', 100_000))
+        return self._local
+
+    @property
+    def shared(self):
+        return getattr(settings, 'SURVEY_PASSED_CACHE_SHARED', False)
+
+    def contains(self, survey_id, user_id):
+        if (survey_id, user_id) in self.local:
+            self.stats.hit()
+            return True
+        if self.shared and cache.get(self.shared_key.format(survey_id=survey_id, user_id=user_id)):
+            self.local.add((survey_id, user_id))
+            self.stats.hit()
+            return True
+        self.stats.miss()
+        return False
+
+    def add(self, survey_id, user_id):
+        self.local.add((survey_id, user_id))
+        if self.shared:
+            cache.set(self.shared_key.format(survey_id=survey_id, user_id=user_id), True,
+                      timeout=getattr(settings, 'SURVEY_PASSED_CACHE_TIMEOUT', 60 * 60 * 24 * 7))
+
+
+survey_detail_cache = SurveyVersionCache('survey-detail')
+survey_schema_cache = SurveyVersionCache('survey-schema')
+passed_survey_cache = PassedSurveyCache()
+
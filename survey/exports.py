@@ -0,0 +1,47 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Selection
+
+EXPORT_FIELDS = ('submission_id', 'user', 'submitted_at', 'question_id', 'question', 'answer_id', 'answer')
+
+
+def response_rows(survey, chunk_size=2000):
+    """
+    One tuple of EXPORT_FIELDS per chosen answer of the survey, read through a server-side cursor
+    so the memory stays flat whatever the number of responses.
+    """
+    return (Selection.objects.filter(submission__survey=survey)
+            .order_by('submission_id', 'question_id', 'answer_id')
+            .values_list('submission_id', 'submission__user__username', 'submission__submitted_at',
+                         'question_id', 'question__question', 'answer_id', 'answer__answer')
+            .iterator(chunk_size=chunk_size))
+
+
+class Echo:
+    """
+    File-like object which returns what is written, so csv.writer produces lines instead of writing them.
+    """
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(dict(zip(EXPORT_FIELDS, row)), cls=DjangoJSONEncoder) + '\n'
+
+
+EXPORT_FORMATS = {
+    'csv': (csv_lines, 'text/csv'),
+    'ndjson': (ndjson_lines, 'application/x-ndjson'),
+}
@@ -0,0 +1,76 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import AsyncClient, Client, override_settings
+
+from rest_framework.authtoken.models import Token
+
+from survey.benchmark import BenchmarkCommand, make_surveys, make_question_tree
+from survey.cache import survey_detail_cache
+from survey.models import Survey
+
+
+class Command(BenchmarkCommand):
+    help = ('Compare the throughput of the sync (WSGI) and async (ASGI) read endpoints under concurrent '
+            'clients on the same dataset.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--surveys', type=int, default=1000)
+        parser.add_argument('--questions', type=int, default=20)
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--requests', type=int, default=20, help='Requests per concurrent client.')
+
+    def run_wsgi(self, url, headers, concurrency, requests):
+        def client_session():
+            client = Client()
+            for _ in range(requests):
+                client.get(url, headers=headers)
+            connection.close()
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for future in [executor.submit(client_session) for _ in range(concurrency)]:
+                future.result()
+
+    def run_asgi(self, url, headers, concurrency, requests):
+        async def client_session():
+            client = AsyncClient()
+            for _ in range(requests):
+                await client.get(url, headers=headers)
+
+        async def run():
+            await asyncio.gather(*[client_session() for _ in range(concurrency)])
+
+        asyncio.run(run())
+
+    def report(self, name, run, *args):
+        start = time.perf_counter()
+        run(*args)
+        elapsed = time.perf_counter() - start
+        total = args[2] * args[3]
+        self.stdout.write(f'{name:<30} {total / elapsed:8.1f} req/s')
+
+    def handle(self, *args, **options):
+        owner = get_user_model().objects.create_user(username='benchmark-async-owner')
+        try:
+            token = Token.objects.create(user=owner)
+            surveys = make_surveys(owner=owner, count=options['surveys'], prefix='Benchmark async survey')
+            make_question_tree(surveys=surveys[:1], questions=options['questions'], answers=4)
+            slug = surveys[0].slug
+            headers = {'authorization': f'Token {token.key}'}
+            run_args = (headers, options['concurrency'], options['requests'])
+
+            for name, sync_url, async_url in (('list', '/survey/', '/survey/async/'),
+                                              ('detail', f'/survey/{slug}/', f'/survey/async/{slug}/'),
+                                              ('statistic', f'/survey/statistic/{slug}/',
+                                               f'/survey/async/statistic/{slug}/')):
+                with override_settings(ALLOWED_HOSTS=['testserver']):
+                    survey_detail_cache.invalidate(slug=slug)
+                    self.report(f'{name} sync (WSGI)', self.run_wsgi, sync_url, *run_args)
+                    survey_detail_cache.invalidate(slug=slug)
+                    self.report(f'{name} async (ASGI)', self.run_asgi, async_url, *run_args)
+        finally:
+            Survey.objects.filter(owner=owner).delete()
+            owner.delete()
@@ -0,0 +1,57 @@
+import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+
+from survey.benchmark import measure
+
+MODES = (
+    ('new connection per request', {'DATABASE_POOL': 'false', 'DATABASE_CONN_MAX_AGE': '0'}),
+    ('persistent connections', {'DATABASE_POOL': 'false', 'DATABASE_CONN_MAX_AGE': '600'}),
+    ('connection pool', {'DATABASE_POOL': 'true'}),
+)
+
+
+class Command(BaseCommand):
+    help = ('Compare the per-request latency of the survey list through the full WSGI handler, which closes '
+            'or returns the connection after every request, without and with persistent connections and pooling.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Requests per thread.')
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--mode', choices=[name for name, _ in MODES],
+                            help='Measure the current settings in this process only, used for every mode.')
+
+    def run_requests(self, handler, count):
+        environ = RequestFactory().get('/survey/', HTTP_HOST='localhost').environ
+
+        def request():
+            response = handler(dict(environ), lambda *args: None)
+            b''.join(response)
+            response.close()  # request_finished, which closes or returns the connection
+
+        return measure('request', request, repeat=count)
+
+    def handle(self, *args, **options):
+        if options['mode']:
+            handler = WSGIHandler()
+            with ThreadPoolExecutor(max_workers=options['threads']) as executor:
+                results = list(executor.map(lambda _: self.run_requests(handler, options['requests']),
+                                            range(options['threads'])))
+            measurement = results[0]
+            measurement.name = options['mode']
+            for result in results[1:]:
+                measurement.timings.extend(result.timings)
+            self.stdout.write(str(measurement))
+            return
+
+        # every mode needs its own settings, so each one runs in a fresh process
+        for name, variables in MODES:
+            subprocess.run([sys.executable, settings.BASE_DIR / 'manage.py', 'benchmark_connections', '--mode', name,
+                            '--requests', str(options['requests']), '--threads', str(options['threads'])],
+                           env={**os.environ, **variables}, check=True)
@@ -0,0 +1,86 @@
+import os
+
+from django.core.management.base import CommandError
+from django.test import Client, override_settings
+
+from rest_framework.authtoken.models import Token
+
+from survey.benchmark import (BenchmarkCommand, analyze, compare_with_baseline, make_dataset, make_question_tree,
+                              make_surveys, make_users, measure, rolled_back, save_baseline)
+from survey.cache import survey_detail_cache
+
+
+class Command(BenchmarkCommand):
+    help = ('Time the list, detail, submit, publish and statistics endpoints through the test client on a '
+            'synthetic dataset, and fail when they regress against a saved baseline.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--surveys', type=int, default=1000)
+        parser.add_argument('--questions', type=int, default=10)
+        parser.add_argument('--answers', type=int, default=4)
+        parser.add_argument('--submissions', type=int, default=500, help='Submissions per survey.')
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--baseline', default='benchmark-baseline.json')
+        parser.add_argument('--save-baseline', action='store_true', help='Replace the baseline with this run.')
+        parser.add_argument('--tolerance', type=float, default=0.5,
+                            help='Allowed p50 slowdown against the baseline, 0.5 = 50%%.')
+
+    def request(self, client, method, url, token, expected=200, **kwargs):
+        response = getattr(client, method)(url, headers={'authorization': f'Token {token}'}, **kwargs)
+        if response.status_code != expected:
+            raise CommandError(f'{method.upper()} {url} returned {response.status_code}: {response.content[:200]}')
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        with override_settings(ALLOWED_HOSTS=['testserver'], INSTRUMENTATION_SAMPLE_RATE=0.0), rolled_back():
+            owner, users, surveys = make_dataset(users=options['users'], surveys=options['surveys'],
+                                                 questions=options['questions'], answers=options['answers'],
+                                                 submissions=options['submissions'], prefix='Benchmark endpoints')
+            drafts = make_surveys(owner=owner, count=repeat, published=False, prefix='Benchmark endpoints draft')
+            make_question_tree(surveys=drafts, questions=options['questions'], answers=options['answers'])
+            submitters = make_users(count=repeat, prefix='benchmark-endpoints-submitter')
+            tokens = Token.objects.bulk_create([Token(user=user, key=Token.generate_key()) for user in submitters])
+            owner_token = Token.objects.create(user=owner).key
+            analyze()
+
+            client = Client()
+            survey = surveys[0]
+            payload = {'answers': [{'question_id': question['pk'], 'answers': [question['answers'][0]['pk']]}
+                                   for question in survey.schema['detail']['question']]}
+            question = payload['answers'][0]['question_id']
+            submitter_tokens = iter(token.key for token in tokens)
+            draft_slugs = iter(draft.slug for draft in drafts)
+
+            def detail_miss():
+                survey_detail_cache.invalidate(slug=survey.slug)
+                self.request(client, 'get', f'/survey/{survey.slug}/', owner_token)
+
+            cases = (
+                ('list', lambda: self.request(client, 'get', '/survey/', owner_token)),
+                ('detail, cached', lambda: self.request(client, 'get', f'/survey/{survey.slug}/', owner_token)),
+                ('detail, cache miss', detail_miss),
+                ('submit', lambda: self.request(client, 'post', f'/survey/submit/{survey.slug}/',
+                                                next(submitter_tokens), data=payload,
+                                                content_type='application/json')),
+                ('publish', lambda: self.request(client, 'patch', f'/survey/published/{next(draft_slugs)}/',
+                                                 owner_token, data={'published': 1},
+                                                 content_type='application/json')),
+                ('statistics', lambda: self.request(client, 'get', f'/survey/statistic/{survey.slug}/',
+                                                    owner_token)),
+                ('statistics query', lambda: self.request(client, 'get', f'/survey/statistic/{survey.slug}/query/',
+                                                          owner_token, data={'question': question})),
+            )
+            measurements = []
+            for name, func in cases:
+                measurements.append(measure(name, func, repeat=repeat))
+                self.stdout.write(str(measurements[-1]))
+
+        if options['save_baseline']:
+            save_baseline(options['baseline'], measurements)
+            self.stdout.write(self.style.SUCCESS(f'Saved the baseline to {options["baseline"]}.'))
+        elif os.path.exists(options['baseline']):
+            regressions = compare_with_baseline(options['baseline'], measurements, tolerance=options['tolerance'])
+            if regressions:
+                raise CommandError('Regressions against the baseline:\n' + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS(f'No regressions against {options["baseline"]}.'))
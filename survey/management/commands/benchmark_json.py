@@ -0,0 +1,118 @@
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+
+from rest_framework import serializers
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from django_project.instrumentation import TimedSerializerMixin
+from django_project.renderers import FastJSONParser, FastJSONRenderer, orjson
+from survey.benchmark import BenchmarkCommand, make_surveys, make_question_tree, measure, rolled_back
+from survey.models import Survey, Question, Answer
+from survey.serializers import SurveyListReadSerializer, SurveyStatisticReadSerializer
+from survey.views import QUESTION_TREE
+
+
+# the ModelSerializers which the read serializers replaced, kept as the baseline of the comparison
+class SurveyListSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    absolute_url = serializers.URLField(read_only=True, source='get_absolute_url')
+
+    class Meta:
+        model = Survey
+        fields = (
+            'title',
+            'description',
+            'absolute_url'
+        )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if not self.context.get('include_description'):
+            self.fields.pop('description')
+
+
+class SurveyStatisticSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    passed_users = serializers.IntegerField(read_only=True, source='passed_count')
+
+    class Meta:
+        model = Survey
+        fields = (
+            'title',
+            'description',
+            'question',
+            'passed_users'
+        )
+
+    def to_representation(self, instance):
+        order_dict = super().to_representation(instance=instance)
+        questions = QuestionStatisticSerializer(instance.question.all(), many=True)
+        order_dict['question'] = questions.data  # rewrite the questions id to question data
+        return order_dict
+
+
+class QuestionStatisticSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Question
+        fields = (
+            'pk',
+            'question',
+            'question_type',
+            'answers'
+        )
+
+    def to_representation(self, instance):
+        order_dict = super().to_representation(instance=instance)
+        answers = AnswerStatisticSerializer(instance.answers.all(), many=True)
+        order_dict['answers'] = answers.data  # rewrite the answers id to answers data
+        return order_dict
+
+
+class AnswerStatisticSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    user_answered = serializers.IntegerField(read_only=True, source='answered_count')
+
+    class Meta:
+        model = Answer
+        fields = (
+            'answer',
+            'user_answered'
+        )
+
+
+class Command(BenchmarkCommand):
+    help = ('Compare ModelSerializer + JSONRenderer with the read serializers + FastJSONRenderer on the '
+            'statistics of a large survey and a list page, and the JSON parsers on a large request body.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--questions', type=int, default=200)
+        parser.add_argument('--answers', type=int, default=10)
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'orjson {"installed" if orjson else "missing, measuring the stdlib fallback"}')
+        with rolled_back():
+            owner = get_user_model().objects.create_user(username='benchmark-json-owner')
+            surveys = make_surveys(owner=owner, count=options['page_size'], prefix='Benchmark json survey')
+            make_question_tree(surveys=surveys[:1], questions=options['questions'], answers=options['answers'])
+            survey = Survey.objects.prefetch_related(QUESTION_TREE).get(pk=surveys[0].pk)
+
+        renderer, fast_renderer = JSONRenderer(), FastJSONRenderer()
+        context = {'include_description': True}
+        cases = (
+            ('statistics, ModelSerializer + JSONRenderer',
+             lambda: renderer.render(SurveyStatisticSerializer(survey).data)),
+            ('statistics, read serializer + FastJSONRenderer',
+             lambda: fast_renderer.render(SurveyStatisticReadSerializer(survey).data)),
+            ('list page, ModelSerializer + JSONRenderer',
+             lambda: renderer.render(SurveyListSerializer(surveys, many=True, context=context).data)),
+            ('list page, read serializer + FastJSONRenderer',
+             lambda: fast_renderer.render(SurveyListReadSerializer(surveys, many=True, context=context).data)),
+        )
+        for name, func in cases:
+            self.stdout.write(str(measure(name, func, repeat=options['repeat'])))
+
+        body = renderer.render({'answers': [{'question_id': question['pk'], 'answers': [1, 2, 3]}
+                                            for question in SurveyStatisticReadSerializer(survey).data['question']]})
+        for name, parser in (('parse, JSONParser', JSONParser()), ('parse, FastJSONParser', FastJSONParser())):
+            self.stdout.write(str(measure(name, lambda: parser.parse(BytesIO(body)), repeat=options['repeat'])))
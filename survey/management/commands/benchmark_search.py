@@ -0,0 +1,67 @@
+import random
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import CommandError
+from django.db.models import Q
+from django.test import Client, override_settings
+from django.utils.text import slugify
+
+from survey.benchmark import BenchmarkCommand, analyze, measure, rolled_back
+from survey.models import Survey
+from survey.search import update_search_vectors
+
+
+class Command(BenchmarkCommand):
+    help = ('Time the survey search against a growing catalogue: a rare and a common term through the GIN '
+            'index, and the rare term by a scan of the titles and descriptions for comparison.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,100000',
+                            help='Comma separated catalogue sizes, each one grows the previous catalogue.')
+        parser.add_argument('--matches', type=int, default=20, help='Surveys which contain the rare term.')
+        parser.add_argument('--vocabulary', type=int, default=1000, help='Distinct words of the descriptions.')
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def make_catalogue(self, owner, start, stop, words, matches, rng):
+        surveys = []
+        for number in range(start, stop):
+            description = ' '.join(rng.sample(words, 20) + (['needle'] if number < matches else []))
+            title = f'Benchmark search survey {number}'
+            surveys.append(Survey(owner=owner, title=title, slug=slugify(title), description=description,
+                                  published=True))
+        created = Survey.objects.bulk_create(surveys, batch_size=5000)
+        update_search_vectors(Survey.objects.filter(pk__gte=created[0].pk, pk__lte=created[-1].pk))
+
+    def search(self, client, text):
+        response = client.get('/survey/search/', {'q': text})
+        if response.status_code != 200:
+            raise CommandError(f'search for {text!r} returned {response.status_code}: {response.content[:200]}')
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        words = [f'topic{number}' for number in range(options['vocabulary'])]
+        rng = random.Random(0)
+        repeat = options['repeat']
+        rare = {}
+        with override_settings(ALLOWED_HOSTS=['testserver'], INSTRUMENTATION_SAMPLE_RATE=0.0), rolled_back():
+            owner = get_user_model().objects.create_user(username='benchmark-search-owner')
+            client = Client()
+            created = 0
+            for size in sizes:
+                self.make_catalogue(owner=owner, start=created, stop=size, words=words,
+                                    matches=options['matches'], rng=rng)
+                created = size
+                analyze()
+                scan = Survey.is_published.filter(Q(title__icontains='needle') | Q(description__icontains='needle'))
+                rare[size] = measure(f'{size} surveys, rare term', lambda: self.search(client, 'needle'),
+                                     repeat=repeat)
+                for measurement in (
+                        rare[size],
+                        measure(f'{size} surveys, common term', lambda: self.search(client, words[0]), repeat=repeat),
+                        measure(f'{size} surveys, rare term by scan', lambda: list(scan[:20]), repeat=repeat)):
+                    self.stdout.write(str(measurement))
+
+        if len(sizes) > 1:
+            first, last = sizes[0], sizes[-1]
+            self.stdout.write(f'{last / first:.0f}x the surveys made the rare term search '
+                              f'{rare[last].p50 / rare[first].p50:.1f}x slower.')
@@ -0,0 +1,43 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from survey.benchmark import (BenchmarkCommand, analyze, make_surveys, make_question_tree, make_users,
+                              make_submissions, measure, rolled_back)
+from survey.models import Selection
+from survey.statistics import survey_statistics
+
+
+class Command(BenchmarkCommand):
+    help = 'Time filtered distributions and cross tabulations on a generated survey (1M selections by default).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--submissions', type=int, default=100_000)
+        parser.add_argument('--questions', type=int, default=10)
+        parser.add_argument('--answers', type=int, default=4)
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            owner = get_user_model().objects.create_user(username='benchmark-statistics-owner')
+            survey = make_surveys(owner=owner, count=1, prefix='Benchmark statistics survey')[0]
+            questions = make_question_tree(surveys=[survey], questions=options['questions'],
+                                           answers=options['answers'])
+            make_submissions(survey=survey, users=make_users(count=options['submissions']))
+            analyze()
+            self.stdout.write(f'{Selection.objects.filter(question__survey=survey).count()} selections')
+
+            first, second = questions[0].pk, questions[1].pk
+            answer = questions[0].answers.first().pk
+            since = timezone.now() - timedelta(days=7)
+            cases = (
+                ('distribution', {'questions': [second]}),
+                ('distribution, 1 answer filter', {'questions': [second], 'answers': [answer]}),
+                ('distribution, last 7 days', {'questions': [second], 'since': since}),
+                ('crosstab', {'crosstabs': [(first, second)]}),
+                ('crosstab, 1 answer filter', {'crosstabs': [(first, second)], 'answers': [answer]}),
+            )
+            for name, query in cases:
+                result = measure(name, lambda: survey_statistics(survey=survey, **query), repeat=options['repeat'])
+                self.stdout.write(str(result))
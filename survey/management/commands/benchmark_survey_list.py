@@ -0,0 +1,32 @@
+from django.contrib.auth import get_user_model
+
+from rest_framework.test import APIClient
+
+from survey.benchmark import BenchmarkCommand, make_surveys, measure, rolled_back
+
+
+class Command(BenchmarkCommand):
+    help = 'Measure the first and the deep pages of the published survey list on a generated catalogue.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--surveys', type=int, default=100_000)
+        parser.add_argument('--pages', type=int, default=50, help='How deep to follow the next cursor.')
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            owner = get_user_model().objects.create_user(username='benchmark-owner')
+            make_surveys(owner=owner, count=options['surveys'])
+            client = APIClient(HTTP_HOST='localhost')
+
+            url = '/survey/'
+            for page in range(1, options['pages'] + 1):
+                if page in (1, 10, options['pages']):
+                    result = measure(f'page {page}', lambda: client.get(url), repeat=options['repeat'])
+                    self.stdout.write(str(result))
+                url = client.get(url).data['next']
+
+            with_description = measure('page 1 with description',
+                                       lambda: client.get('/survey/', {'include': 'description'}),
+                                       repeat=options['repeat'])
+            self.stdout.write(str(with_description))
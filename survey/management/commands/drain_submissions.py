@@ -0,0 +1,78 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.utils import timezone
+
+from survey.models import Submission, PendingSubmission
+
+
+class Command(BaseCommand):
+    help = 'Store the submissions accepted in the async ingest mode in large batched transactions.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--loop', action='store_true', help='Keep draining the outbox until interrupted.')
+        parser.add_argument('--sleep', type=float, default=1.0, help='Seconds to wait when the outbox is empty.')
+        parser.add_argument('--retries', type=int, default=3,
+                            help='Attempts of a batch which fails with a deadlock or another transient error.')
+
+    def drain(self, batch_size):
+        """
+        Move one batch from the outbox to the submissions. The outbox rows are locked with SKIP LOCKED,
+        so several workers can drain in parallel, and are deleted in the same transaction in which their
+        submissions are stored, so every (survey, user) pair is stored exactly once.
+
+        A batch which still violates a constraint, e.g. of a row deleted meanwhile, is stored row by row,
+        and the rows which fail are set aside with their error, so they don't block the rest of the outbox.
+        """
+        with transaction.atomic():
+            pending = list(PendingSubmission.objects.filter(failed_at__isnull=True)
+                           .select_for_update(skip_locked=True).order_by('pk')[:batch_size])
+            if not pending:
+                return 0
+            with connection.cursor() as cursor:
+                cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')  # fail in the savepoint rather than at commit
+            failed = {}
+            try:
+                with transaction.atomic():
+                    Submission.objects.record_many([entry.to_submission() for entry in pending])
+            except IntegrityError:
+                for entry in pending:
+                    try:
+                        with transaction.atomic():
+                            Submission.objects.record_many([entry.to_submission()])
+                    except IntegrityError as exc:
+                        failed[entry.pk] = str(exc)
+            PendingSubmission.objects.filter(pk__in=[entry.pk for entry in pending if entry.pk not in failed]).delete()
+            for pk, error in failed.items():
+                self.stderr.write(f'Set aside the pending submission {pk}: {error}')
+                PendingSubmission.objects.filter(pk=pk).update(failed_at=timezone.now(), error=error)
+        return len(pending)
+
+    def drain_with_retry(self, batch_size, retries):
+        """
+        Drain a batch, trying it again when the transaction fails, e.g. on a deadlock with another worker;
+        the failed transaction is rolled back, so its outbox rows are still there.
+        """
+        for attempt in range(1, retries + 1):
+            try:
+                return self.drain(batch_size=batch_size)
+            except OperationalError as exc:
+                if attempt == retries:
+                    raise
+                self.stderr.write(f'Retrying the batch after: {exc}')
+                time.sleep(0.1 * attempt)
+
+    def handle(self, *args, **options):
+        drained = 0
+        while True:
+            count = self.drain_with_retry(batch_size=options['batch_size'], retries=options['retries'])
+            drained += count
+            if count:
+                self.stdout.write(f'Stored {count} submissions.')
+            elif options['loop']:
+                time.sleep(options['sleep'])
+            else:
+                break
+        self.stdout.write(self.style.SUCCESS(f'Stored {drained} submissions in total.'))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from survey.exports import EXPORT_FORMATS, response_rows
+from survey.models import Survey
+
+
+class Command(BaseCommand):
+    help = 'Stream the raw responses of a survey as CSV or NDJSON to a file or stdout.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('slug')
+        parser.add_argument('--output', choices=EXPORT_FORMATS, default='csv')
+        parser.add_argument('--file', help='Write to the file instead of stdout.')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        try:
+            survey = Survey.objects.get(slug=options['slug'])
+        except Survey.DoesNotExist:
+            raise CommandError(f'There is no survey {options["slug"]}')
+        lines, _ = EXPORT_FORMATS[options['output']]
+        rows = response_rows(survey=survey, chunk_size=options['chunk_size'])
+        if options['file']:
+            with open(options['file'], 'w', newline='') as file:
+                file.writelines(lines(rows))
+        else:
+            for line in lines(rows):
+                self.stdout.write(line, ending='')
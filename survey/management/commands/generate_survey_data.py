@@ -0,0 +1,27 @@
+from django.core.management import call_command
+from django.db import transaction
+
+from survey.benchmark import BenchmarkCommand, make_dataset
+
+
+class Command(BenchmarkCommand):
+    help = 'Generate a synthetic dataset of users, published surveys with questions and answers, and submissions.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10_000)
+        parser.add_argument('--surveys', type=int, default=1000)
+        parser.add_argument('--questions', type=int, default=10, help='Questions per survey.')
+        parser.add_argument('--answers', type=int, default=4, help='Answers per question.')
+        parser.add_argument('--submissions', type=int, default=100, help='Submissions per survey.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--prefix', default='Synthetic', help='Prefix of the usernames and survey titles.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            owner, users, surveys = make_dataset(users=options['users'], surveys=options['surveys'],
+                                                 questions=options['questions'], answers=options['answers'],
+                                                 submissions=options['submissions'], seed=options['seed'],
+                                                 prefix=options['prefix'])
+            call_command('rebuild_survey_counters', stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f'Generated {len(users)} users and {len(surveys)} surveys '
+                                             f'owned by {owner.username}.'))
@@ -0,0 +1,36 @@
+import json
+
+import yaml
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from survey.serializers import SurveyTreeSerializer
+
+
+class Command(BaseCommand):
+    help = ('Create draft surveys from a JSON or YAML file holding one survey tree or a list of them, '
+            'in the format of the bulk export endpoint.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('file')
+        parser.add_argument('--owner', required=True, help='Username of the owner of the surveys.')
+
+    def load(self, path):
+        with open(path) as file:
+            if path.endswith(('.yaml', '.yml')):
+                return yaml.safe_load(file)
+            return json.load(file)
+
+    def handle(self, *args, **options):
+        try:
+            owner = get_user_model().objects.get(username=options['owner'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'There is no user {options["owner"]}')
+        documents = self.load(options['file'])
+        for document in documents if isinstance(documents, list) else [documents]:
+            serializer = SurveyTreeSerializer(data=document)
+            if not serializer.is_valid():
+                raise CommandError(f'{document.get("title")}: {serializer.errors}')
+            survey = serializer.save(owner=owner)
+            self.stdout.write(f'Created {survey.slug}.')
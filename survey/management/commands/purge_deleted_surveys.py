@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from survey.models import SurveyPurge
+from survey.purge import purge_survey
+
+
+class Command(BaseCommand):
+    help = 'Delete the rows of the deleted surveys in small batches, continuing the interrupted purges.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows of a table per transaction.')
+        parser.add_argument('--pause', type=float, default=0.01, help='Seconds to wait between the batches.')
+        parser.add_argument('--loop', action='store_true', help='Keep purging until interrupted.')
+        parser.add_argument('--sleep', type=float, default=60.0, help='Seconds to wait when nothing is deleted.')
+
+    def handle(self, *args, **options):
+        purged = 0
+        while True:
+            purge = SurveyPurge.objects.filter(finished_at__isnull=True).order_by('requested_at').first()
+            if purge is not None:
+                deleted = purge_survey(purge=purge, batch_size=options['batch_size'], pause=options['pause'])
+                purged += 1
+                self.stdout.write(f'Purged "{purge.title}", {purge.deleted_rows + deleted} rows.')
+            elif options['loop']:
+                time.sleep(options['sleep'])
+            else:
+                break
+        self.stdout.write(self.style.SUCCESS(f'Purged {purged} surveys.'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models.functions import Now
+
+from survey.models import Survey, Answer, Submission, Selection, count_of
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the denormalized pass and vote counters of surveys and answers from the submissions.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            surveys = Survey.objects.update(passed_count=count_of(Submission, 'survey'), counted_at=Now())
+            answers = Answer.objects.update(answered_count=count_of(Selection, 'answer'))
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt counters of {surveys} surveys and {answers} answers.'))
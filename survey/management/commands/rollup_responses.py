@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from survey.rollups import roll_up
+
+
+class Command(BaseCommand):
+    help = 'Aggregate the new submissions into the hourly and daily response rollups.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--delay', type=float, default=60.0,
+                            help='Leave the submissions stored less than this many seconds ago for the next run; '
+                                 'must exceed the longest transaction which stores submissions.')
+        parser.add_argument('--loop', action='store_true', help='Keep rolling up until interrupted.')
+        parser.add_argument('--sleep', type=float, default=60.0, help='Seconds to wait when nothing is new.')
+
+    def handle(self, *args, **options):
+        rolled = 0
+        while True:
+            count = roll_up(batch_size=options['batch_size'], delay=options['delay'])
+            rolled += count
+            if count:
+                self.stdout.write(f'Rolled up {count} submissions.')
+            elif options['loop']:
+                time.sleep(options['sleep'])
+            else:
+                break
+        self.stdout.write(self.style.SUCCESS(f'Rolled up {rolled} submissions in total.'))
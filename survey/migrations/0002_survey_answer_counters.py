@@ -0,0 +1,36 @@
+# Generated by Django 5.0.1 on 2026-10-17 18:46
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    Survey = apps.get_model('survey', 'Survey')
+    Answer = apps.get_model('survey', 'Answer')
+    for model, field, name in ((Survey, 'passed_count', 'users_pass'), (Answer, 'answered_count', 'user')):
+        through = getattr(model, name).through
+        column = model._meta.model_name
+        rows = through.objects.filter(**{column: OuterRef('pk')}).order_by().values(column)
+        model.objects.update(**{field: Coalesce(Subquery(rows.annotate(count=Count('*')).values('count')), 0)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='answer',
+            name='answered_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='survey',
+            name='passed_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.0.1 on 2026-10-17 18:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0002_survey_answer_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='survey',
+            options={'ordering': ['-created_at', '-id']},
+        ),
+        migrations.AddIndex(
+            model_name='survey',
+            index=models.Index(fields=['-created_at', '-id'], name='survey_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='survey',
+            index=models.Index(fields=['published', '-created_at', '-id'], name='survey_published_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='survey',
+            index=models.Index(fields=['owner', '-created_at', '-id'], name='survey_owner_created_idx'),
+        ),
+    ]
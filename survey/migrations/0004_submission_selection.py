@@ -0,0 +1,83 @@
+# Generated by Django 5.0.1 on 2026-10-17 18:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def copy_votes(apps, schema_editor):
+    """
+    Turn the users_pass and Answer.user through rows into submissions and selections. The through
+    tables have no timestamps, so the submissions are stamped with the time of the migration.
+    """
+    Survey = apps.get_model('survey', 'Survey')
+    Answer = apps.get_model('survey', 'Answer')
+    Submission = apps.get_model('survey', 'Submission')
+    Selection = apps.get_model('survey', 'Selection')
+
+    votes = Answer.user.through.objects.values_list('answer_id', 'answer__question_id',
+                                                    'answer__question__survey_id', 'user_id')
+    pairs = set(Survey.users_pass.through.objects.values_list('survey_id', 'user_id'))
+    pairs.update((survey, user) for _, _, survey, user in votes.iterator())
+    Submission.objects.bulk_create([Submission(survey_id=survey, user_id=user) for survey, user in pairs],
+                                   batch_size=5000)
+
+    submissions = {(survey, user): pk for pk, survey, user in
+                   Submission.objects.values_list('pk', 'survey_id', 'user_id').iterator()}
+    Selection.objects.bulk_create((Selection(submission_id=submissions[(survey, user)], question_id=question,
+                                             answer_id=answer) for answer, question, survey, user in votes.iterator()),
+                                  batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0003_survey_list_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Submission',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('submitted_at', models.DateTimeField(auto_now_add=True)),
+                ('survey', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='submissions', to='survey.survey')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='submissions', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Selection',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('answer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='selections', to='survey.answer')),
+                ('question', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='selections', to='survey.question')),
+                ('submission', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='selections', to='survey.submission')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['survey', 'submitted_at'], name='submission_survey_time_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='submission',
+            constraint=models.UniqueConstraint(fields=('survey', 'user'), name='unique_submission_per_user'),
+        ),
+        migrations.AddIndex(
+            model_name='selection',
+            index=models.Index(fields=['question', 'answer'], name='selection_question_answer_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='selection',
+            constraint=models.UniqueConstraint(fields=('submission', 'answer'), name='unique_selection_per_submission'),
+        ),
+        migrations.RunPython(copy_votes, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='answer',
+            name='user',
+        ),
+        migrations.RemoveField(
+            model_name='survey',
+            name='users_pass',
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.0.1 on 2026-10-17 19:17
+
+import time
+
+from django.db import migrations, models
+
+
+def compile_schemas(apps, schema_editor):
+    Survey = apps.get_model('survey', 'Survey')
+    Question = apps.get_model('survey', 'Question')
+    Answer = apps.get_model('survey', 'Answer')
+    for survey in Survey.objects.filter(published=True).iterator():
+        answers = {}
+        for answer in Answer.objects.filter(question__survey=survey).order_by('pk'):
+            answers.setdefault(answer.question_id, []).append({'pk': answer.pk, 'answer': answer.answer})
+        survey.schema = {
+            'compiled_at': time.time_ns(),
+            'detail': {
+                'title': survey.title,
+                'description': survey.description,
+                'question': [{
+                    'pk': question.pk,
+                    'question': question.question,
+                    'question_type': question.question_type,
+                    'answers': answers.get(question.pk, []),
+                } for question in Question.objects.filter(survey=survey).order_by('pk')],
+            },
+        }
+        survey.save(update_fields=['schema'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0005_pending_submission'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='survey',
+            name='schema',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(compile_schemas, migrations.RunPython.noop),
+    ]
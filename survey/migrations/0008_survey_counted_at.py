@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-17 19:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0007_response_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='survey',
+            name='counted_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.15 on 2026-10-17 19:42
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations, models
+
+from survey.search import search_vector_expression
+
+
+def fill_search_vectors(apps, schema_editor):
+    Survey = apps.get_model('survey', 'Survey')
+    Question = apps.get_model('survey', 'Question')
+    Survey.objects.update(search_vector=search_vector_expression(question_model=Question))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0008_survey_counted_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='survey',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_search_vectors, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='survey',
+            index=django.contrib.postgres.indexes.GinIndex(condition=models.Q(('published', True)),
+                                                          fields=['search_vector'], name='survey_search_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.1.15 on 2026-10-17 19:48
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0009_survey_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SurveyPurge',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('survey_id', models.BigIntegerField(unique=True)),
+                ('title', models.CharField(max_length=255)),
+                ('requested_at', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+                ('step', models.CharField(blank=True, max_length=50)),
+                ('deleted_rows', models.PositiveBigIntegerField(default=0)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='survey',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name='survey',
+            name='title',
+            field=models.CharField(db_index=True, max_length=255),
+        ),
+        migrations.AddConstraint(
+            model_name='survey',
+            constraint=models.UniqueConstraint(condition=models.Q(('deleted_at__isnull', True)), fields=('title',), name='unique_survey_title'),
+        ),
+        migrations.AddIndex(
+            model_name='surveypurge',
+            index=models.Index(condition=models.Q(('finished_at__isnull', True)), fields=['requested_at'], name='survey_purge_pending_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.15 on 2026-10-17 20:10
+
+import django.db.models.functions.datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0010_survey_soft_delete'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='stored_at',
+            field=models.DateTimeField(db_default=django.db.models.functions.datetime.Now(), editable=False),
+        ),
+    ]
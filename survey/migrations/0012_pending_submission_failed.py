@@ -0,0 +1,23 @@
+# Generated by Django 5.1.15 on 2026-10-17 20:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0011_submission_stored_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pendingsubmission',
+            name='error',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='pendingsubmission',
+            name='failed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
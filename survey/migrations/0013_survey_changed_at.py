@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-17 20:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0012_pending_submission_failed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='survey',
+            name='changed_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
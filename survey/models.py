@@ -1,15 +1,38 @@
+from collections import Counter
+
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.shortcuts import reverse
 from django.db import models
+from django.db.models.functions import Coalesce, Now
 from django.template.defaultfilters import slugify
+from django.utils import timezone
+
+
+def count_of(model, field):
+    """
+    Correlated subquery counting the rows of the model which point to the outer row.
+    """
+    rows = model.objects.filter(**{field: models.OuterRef('pk')}).order_by().values(field)
+    return Coalesce(models.Subquery(rows.annotate(count=models.Count('*')).values('count')), 0)
+
+
+class SurveyManager(models.Manager):
+    """
+    The surveys which are not deleted; deleted surveys wait for purge_deleted_surveys, see purge.py.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
 
 
-class IsPublishedManager(models.Manager):
+class IsPublishedManager(SurveyManager):
     def get_queryset(self):
         return super().get_queryset().filter(published=Survey.PublishedChoice.PUBLISHED)
 
 
-class IsDraftManager(models.Manager):
+class IsDraftManager(SurveyManager):
     def get_queryset(self):
         return super().get_queryset().filter(published=Survey.PublishedChoice.DRAFT)
 
@@ -21,28 +44,38 @@ class Survey(models.Model):
         __empty__ = 'Status'
 
     owner = models.ForeignKey(to=get_user_model(), on_delete=models.CASCADE, related_name='surveys')
-    title = models.CharField(max_length=255, unique=True, db_index=True)
+    title = models.CharField(max_length=255, db_index=True)  # unique among the surveys which are not deleted
     slug = models.SlugField(max_length=255, editable=False, db_index=True)
     description = models.TextField(max_length=2000, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True, editable=False)
+    changed_at = models.DateTimeField(auto_now=True)  # bumped by the signals on changes of the questions too
     published = models.BooleanField(choices=PublishedChoice, default=PublishedChoice.DRAFT)
-    users_pass = models.ManyToManyField(to=get_user_model(), related_name='passes_survey', blank=True)
+    passed_count = models.PositiveIntegerField(default=0, editable=False)  # denormalized submissions count
+    counted_at = models.DateTimeField(null=True, editable=False)  # when passed_count last changed
+    schema = models.JSONField(null=True, blank=True, editable=False)  # compiled when published, see schema.py
+    search_vector = SearchVectorField(null=True, editable=False)  # kept in sync by the signals, see search.py
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
 
-    objects = models.Manager()
+    objects = SurveyManager()
+    all_objects = models.Manager()  # including the deleted surveys
     is_published = IsPublishedManager()
     is_draft = IsDraftManager()
 
-    def add_passed_user(self, user):
-        self.users_pass.add(user)
-
-    def passed_users(self):
-        return self.users_pass.all()
-
-    def how_many_user_passes(self):
-        return self.users_pass.count()
+    def is_passed_by(self, user):
+        return self.submissions.filter(user=user).exists()
 
     class Meta:
-        ordering = ['-created_at']
+        ordering = ['-created_at', '-id']
+        constraints = [
+            models.UniqueConstraint(fields=['title'], condition=models.Q(deleted_at__isnull=True),
+                                    name='unique_survey_title'),
+        ]
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='survey_created_idx'),
+            models.Index(fields=['published', '-created_at', '-id'], name='survey_published_created_idx'),
+            models.Index(fields=['owner', '-created_at', '-id'], name='survey_owner_created_idx'),
+            GinIndex(fields=['search_vector'], name='survey_search_idx', condition=models.Q(published=True)),
+        ]
 
     def __str__(self):
         return self.title
@@ -73,14 +106,195 @@ class Question(models.Model):
 
 class Answer(models.Model):
     question = models.ForeignKey('Question', related_name='answers', on_delete=models.CASCADE)
-    user = models.ManyToManyField(to=get_user_model(), related_name='answers', blank=True)
     answer = models.CharField(max_length=255)
+    answered_count = models.PositiveIntegerField(default=0, editable=False)  # denormalized selections count
+
+    def __str__(self):
+        return self.question.question + ' ' + self.answer[:50]
+
 
-    def add_user(self, user):
-        self.user.add(user)
+class SubmissionManager(models.Manager):
+    def _bump_counters(self, surveys, answers):
+        """
+        Add the number of times each survey and answer (ids) appears in the lists to their counters, with
+        one UPDATE per table. The rows are locked in pk order first, so concurrent batches which bump the
+        same hot rows can't deadlock.
+        """
+        now = timezone.now()
+        for model, field, ids, stamps in ((Survey, 'passed_count', surveys, {'counted_at': now}),
+                                          (Answer, 'answered_count', answers, {})):
+            increments = Counter(ids)
+            if not increments:
+                continue
+            rows = model._base_manager.filter(pk__in=sorted(increments))
+            list(rows.select_for_update().order_by('pk').values_list('pk', flat=True))
+            increment = models.Case(*[models.When(pk=pk, then=models.Value(count))
+                                      for pk, count in increments.items()], output_field=models.IntegerField())
+            rows.update(**{field: models.F(field) + increment}, **stamps)
 
-    def how_many_user_answered(self):
-        return self.user.count()
+    def record(self, survey, user, answers):
+        """
+        Store the submission of the survey by the user, where answers is a list of
+        {'question_id': id, 'answers': [id, ...]}, and bump the survey and answer counters.
+        The unique (survey, user) pair rejects a second submission with an IntegrityError.
+        """
+        submission = self.create(survey=survey, user=user)
+        selections = Selection.objects.bulk_create(submission.build_selections(answers=answers))
+        self._bump_counters(surveys=[survey.pk], answers=[selection.answer_id for selection in selections])
+        return submission
+
+    def record_many(self, submissions):
+        """
+        Store a batch of unsaved submissions which carry their answers in the answers attribute,
+        skipping the (survey, user) pairs which are already stored, the surveys deleted since and
+        the selections of the answers deleted since. Returns the stored submissions.
+        """
+        live = set(Survey.objects.filter(pk__in={submission.survey_id for submission in submissions})
+                   .values_list('pk', flat=True))
+        answer_ids = {answer for submission in submissions
+                      for data in submission.answers for answer in data.get('answers')}
+        answers = set(Answer.objects.filter(pk__in=answer_ids).values_list('pk', 'question_id'))
+        stored = set(self.filter(survey_id__in={submission.survey_id for submission in submissions},
+                                 user_id__in={submission.user_id for submission in submissions})
+                     .values_list('survey_id', 'user_id'))
+        new = []
+        for submission in submissions:
+            if submission.survey_id in live and (submission.survey_id, submission.user_id) not in stored:
+                stored.add((submission.survey_id, submission.user_id))
+                new.append(submission)
+        self.bulk_create(new)
+        selections = Selection.objects.bulk_create(
+            [selection for submission in new for selection in submission.build_selections(submission.answers)
+             if (selection.answer_id, selection.question_id) in answers])
+        self._bump_counters(surveys=[submission.survey_id for submission in new],
+                            answers=[selection.answer_id for selection in selections])
+        return new
+
+
+class Submission(models.Model):
+    user = models.ForeignKey(to=get_user_model(), related_name='submissions', on_delete=models.CASCADE)
+    survey = models.ForeignKey('Survey', related_name='submissions', on_delete=models.CASCADE)
+    submitted_at = models.DateTimeField(default=timezone.now, editable=False)
+    # when the row was inserted, by the clock of the database, see rollups.py
+    stored_at = models.DateTimeField(db_default=Now(), editable=False)
+
+    objects = SubmissionManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['survey', 'user'], name='unique_submission_per_user'),
+        ]
+        indexes = [
+            models.Index(fields=['survey', 'submitted_at'], name='submission_survey_time_idx'),
+        ]
 
     def __str__(self):
-        return self.question.question + ' ' + self.answer[:50]
+        return f'{self.user} {self.survey}'
+
+    def build_selections(self, answers):
+        return [Selection(submission=self, question_id=data.get('question_id'), answer_id=answer)
+                for data in answers for answer in data.get('answers')]
+
+
+class Selection(models.Model):
+    submission = models.ForeignKey('Submission', related_name='selections', on_delete=models.CASCADE)
+    question = models.ForeignKey('Question', related_name='selections', on_delete=models.CASCADE,
+                                 db_index=False)  # covered by the (question, answer) index
+    answer = models.ForeignKey('Answer', related_name='selections', on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['submission', 'answer'], name='unique_selection_per_submission'),
+        ]
+        indexes = [
+            models.Index(fields=['question', 'answer'], name='selection_question_answer_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.submission} {self.answer}'
+
+
+class PendingSubmission(models.Model):
+    """
+    Outbox of the submissions accepted in the async ingest mode, drained by the drain_submissions command.
+    """
+    user = models.ForeignKey(to=get_user_model(), related_name='pending_submissions', on_delete=models.CASCADE)
+    survey = models.ForeignKey('Survey', related_name='pending_submissions', on_delete=models.CASCADE)
+    answers = models.JSONField()
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+    # set aside by drain_submissions when the row can't be stored, kept for inspection
+    failed_at = models.DateTimeField(null=True, blank=True, editable=False)
+    error = models.TextField(blank=True, editable=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['survey', 'user'], name='unique_pending_submission_per_user'),
+        ]
+
+    def __str__(self):
+        return f'{self.user} {self.survey}'
+
+    def to_submission(self):
+        submission = Submission(survey_id=self.survey_id, user_id=self.user_id, submitted_at=self.created_at)
+        submission.answers = self.answers
+        return submission
+
+
+class ResponseRollup(models.Model):
+    """
+    Number of submissions (answer is null) and of selections of each answer of a survey per hour or day,
+    aggregated from the submissions by the rollup_responses command.
+    """
+    class Period(models.TextChoices):
+        HOUR = ('hour', 'Hour')
+        DAY = ('day', 'Day')
+
+    survey = models.ForeignKey('Survey', related_name='rollups', on_delete=models.CASCADE,
+                               db_index=False)  # covered by the unique (survey, period, bucket, answer) index
+    answer = models.ForeignKey('Answer', related_name='rollups', null=True, on_delete=models.CASCADE)
+    period = models.CharField(max_length=4, choices=Period)
+    bucket = models.DateTimeField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['survey', 'period', 'bucket', 'answer'], name='unique_rollup_bucket',
+                                    nulls_distinct=False),
+        ]
+
+    def __str__(self):
+        return f'{self.survey_id} {self.period} {self.bucket} {self.answer_id}: {self.count}'
+
+
+class RollupMark(models.Model):
+    """
+    High-water mark of a rollup: the submissions up to this id are already aggregated.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    submission_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.name}: {self.submission_id}'
+
+
+class SurveyPurge(models.Model):
+    """
+    Progress of the purge of a deleted survey, whose rows purge_deleted_surveys removes in small batches.
+    The survey id is kept without a foreign key, so the record outlives the survey.
+    """
+    survey_id = models.BigIntegerField(unique=True)
+    title = models.CharField(max_length=255)
+    requested_at = models.DateTimeField(default=timezone.now, editable=False)
+    step = models.CharField(max_length=50, blank=True)  # the table being purged
+    deleted_rows = models.PositiveBigIntegerField(default=0)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['requested_at'], condition=models.Q(finished_at__isnull=True),
+                         name='survey_purge_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.title}: {self.deleted_rows} rows deleted'
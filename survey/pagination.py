@@ -0,0 +1,98 @@
+from datetime import datetime
+
+from django.db.models import Q
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+def keyset_filter(queryset, created_at, pk, reverse=False):
+    """
+    The surveys after the (created_at, id) position in the ('-created_at', '-id') order, or before it when
+    reverse. Postgres can't bound an index scan by the OR of the tie-break, so the redundant bound on
+    created_at is what turns the page into a range of the index.
+    """
+    if reverse:
+        return queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, pk__gt=pk),
+                               created_at__gte=created_at)
+    return queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk),
+                           created_at__lte=created_at)
+
+
+class SurveyCursorPagination(CursorPagination):
+    """
+    Keyset pagination over the (created_at, id) index of the surveys.
+
+    DRF's cursor holds only the first ordering field and skips the rows which share it with an offset.
+    Here the cursor position is the (created_at, id) pair, which is unique, so every page is a range of
+    the index whatever the ties of created_at, see keyset_filter().
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
+
+    def _get_position_from_instance(self, instance, ordering):
+        return f'{instance.created_at.isoformat()}|{instance.pk}'
+
+    def decode_position(self, position):
+        try:
+            created_at, pk = position.split('|')
+            return datetime.fromisoformat(created_at), int(pk)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        CursorPagination.paginate_queryset() with the filter on the (created_at, id) position.
+        """
+        return self.set_page(list(self.page_queryset(queryset, request)))
+
+    def page_queryset(self, queryset, request):
+        """
+        The surveys of the page the cursor of the request points to, and one more which tells whether
+        a page follows; set_page() takes the results, e.g. of the async list.
+        """
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        offset, reverse, current_position = self.cursor or (0, False, None)
+        if reverse:  # the page before the position, read backwards from it
+            queryset = queryset.order_by('created_at', 'id')
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if current_position is not None:
+            created_at, pk = self.decode_position(current_position)
+            queryset = keyset_filter(queryset, created_at=created_at, pk=pk, reverse=reverse)
+        # the offset is 0 unless a client crafted the cursor
+        return queryset[offset:offset + self.page_size + 1]
+
+    def set_page(self, results):
+        offset, reverse, current_position = self.cursor or (0, False, None)
+        self.page = results[:self.page_size]
+        following_position = None
+        if len(results) > len(self.page):
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = current_position is not None or offset > 0
+            self.has_previous = following_position is not None
+            self.next_position, self.previous_position = current_position, following_position
+        else:
+            self.has_next = following_position is not None
+            self.has_previous = current_position is not None or offset > 0
+            self.next_position, self.previous_position = following_position, current_position
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+
+class SurveySearchPagination(PageNumberPagination):
+    """
+    Pages of the search results, which are ordered by rank and can't be keyset paginated; searches are
+    selective, so the offsets stay small.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
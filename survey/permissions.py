@@ -11,3 +11,12 @@ class IsOwnerOfSurvey(BasePermission):
 class IsSurveyDraft(BasePermission):
     def has_object_permission(self, request, view, obj):
         return not obj.published
+
+
+class IsOwnerOfSurveyData(BasePermission):
+    """
+    Unlike IsOwnerOfSurvey, the safe methods are limited to the owner as well.
+    """
+
+    def has_object_permission(self, request, view, obj):
+        return obj.owner_id == request.user.pk  # without loading the owner
@@ -0,0 +1,164 @@
+"""
+Deletion of surveys in two phases.
+
+mark_deleted() hides the survey from every manager at once and records a SurveyPurge. purge_survey(),
+run by purge_deleted_surveys, then deletes the rows of the survey table by table, in batches of bounded
+size which are committed one by one, so the purge holds no long locks and never loads the rows like the
+cascade of Model.delete() does. Its progress is kept in the SurveyPurge, and an interrupted purge
+continues where it stopped.
+
+purge_questions() and purge_answers() delete questions and answers with their selections in the same
+kind of batches, right away since no manager hides them.
+"""
+import time
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .cache import survey_detail_cache
+from .models import Survey, Question, Answer, Submission, Selection, PendingSubmission, ResponseRollup, SurveyPurge
+from .signals import schedule_schema_compile
+
+
+def _table(model):
+    return connection.ops.quote_name(model._meta.db_table)
+
+
+def purge_steps():
+    """
+    (name, query of a batch of ids, deletes of the ids) in dependency order, the selections go with
+    their submissions.
+    """
+    return (
+        ('pending submissions', f'SELECT id FROM {_table(PendingSubmission)} WHERE survey_id = %s LIMIT %s',
+         [f'DELETE FROM {_table(PendingSubmission)} WHERE id = ANY(%s)']),
+        ('submissions', f'SELECT id FROM {_table(Submission)} WHERE survey_id = %s LIMIT %s',
+         [f'DELETE FROM {_table(Selection)} WHERE submission_id = ANY(%s)',
+          f'DELETE FROM {_table(Submission)} WHERE id = ANY(%s)']),
+        ('rollups', f'SELECT id FROM {_table(ResponseRollup)} WHERE survey_id = %s LIMIT %s',
+         [f'DELETE FROM {_table(ResponseRollup)} WHERE id = ANY(%s)']),
+        ('answers', f'SELECT a.id FROM {_table(Answer)} a JOIN {_table(Question)} q ON q.id = a.question_id '
+                    f'WHERE q.survey_id = %s LIMIT %s',
+         [f'DELETE FROM {_table(Answer)} WHERE id = ANY(%s)']),
+        ('questions', f'SELECT id FROM {_table(Question)} WHERE survey_id = %s LIMIT %s',
+         [f'DELETE FROM {_table(Question)} WHERE id = ANY(%s)']),
+    )
+
+
+def mark_deleted(survey):
+    """
+    Hide the survey and record its purge. Returns False when a concurrent delete marked it first.
+    """
+    with transaction.atomic():
+        if not Survey.objects.filter(pk=survey.pk).update(deleted_at=timezone.now()):
+            return False
+        SurveyPurge.objects.create(survey_id=survey.pk, title=survey.title)
+    survey_detail_cache.invalidate(slug=survey.slug)
+    return True
+
+
+def _delete_batch(purge, step, batch_size):
+    name, select, deletes = step
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(select, [purge.survey_id, batch_size])
+        ids = [row[0] for row in cursor.fetchall()]
+        if not ids:
+            return 0
+        deleted = 0
+        for delete in deletes:
+            cursor.execute(delete, [ids])
+            deleted += cursor.rowcount
+        SurveyPurge.objects.filter(pk=purge.pk).update(step=name, deleted_rows=F('deleted_rows') + deleted)
+    return deleted
+
+
+def purge_survey(purge, batch_size=1000, pause=0.0):
+    """
+    Delete the rows of the survey of the purge, pausing between the batches to leave room for the
+    other traffic. Returns the number of deleted rows.
+    """
+    deleted = 0
+    while True:
+        for step in purge_steps():
+            while count := _delete_batch(purge=purge, step=step, batch_size=batch_size):
+                deleted += count
+                time.sleep(pause)
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
+                # the foreign keys are checked at commit, which fails if rows were added meanwhile
+                cursor.execute(f'DELETE FROM {_table(Survey)} WHERE id = %s AND deleted_at IS NOT NULL',
+                               [purge.survey_id])
+                removed = cursor.rowcount
+                SurveyPurge.objects.filter(pk=purge.pk).update(
+                    step='', deleted_rows=F('deleted_rows') + removed, finished_at=timezone.now())
+        except IntegrityError:
+            continue  # e.g. a rollup of late submissions
+        return deleted + removed
+
+
+def answer_steps():
+    """
+    (query of a batch of ids, deletes of the ids) of the rows of a list of answers, in dependency order.
+    """
+    return (
+        (f'SELECT id FROM {_table(Selection)} WHERE answer_id = ANY(%s) LIMIT %s',
+         [f'DELETE FROM {_table(Selection)} WHERE id = ANY(%s)']),
+        (f'SELECT id FROM {_table(ResponseRollup)} WHERE answer_id = ANY(%s) LIMIT %s',
+         [f'DELETE FROM {_table(ResponseRollup)} WHERE id = ANY(%s)']),
+        (f'SELECT id FROM {_table(Answer)} WHERE id = ANY(%s) LIMIT %s',
+         [f'DELETE FROM {_table(Answer)} WHERE id = ANY(%s)']),
+    )
+
+
+def _delete_rows(steps, ids, batch_size):
+    deleted = 0
+    for select, deletes in steps:
+        while True:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(select, [ids, batch_size])
+                batch = [row[0] for row in cursor.fetchall()]
+                if not batch:
+                    break
+                for delete in deletes:
+                    cursor.execute(delete, [batch])
+                    deleted += cursor.rowcount
+    return deleted
+
+
+def _changed(survey_ids):
+    # the raw deletes send no post_delete, so the surveys are invalidated like the signals do
+    Survey.objects.filter(pk__in=survey_ids).update(changed_at=timezone.now())
+    surveys = Survey.objects.filter(pk__in=survey_ids).values_list('pk', 'slug', 'published')
+    for survey_id, slug, published in surveys:
+        survey_detail_cache.invalidate(slug=slug)
+        if published:
+            schedule_schema_compile(survey_id=survey_id)
+
+
+def purge_answers(answers, batch_size=1000):
+    """
+    Delete the answers of the queryset with their selections and rollups in batches, instead of the
+    cascade of QuerySet.delete() which loads every selection. Returns the number of deleted rows.
+    """
+    answers = answers.order_by()
+    survey_ids = set(answers.values_list('question__survey_id', flat=True))
+    deleted = _delete_rows(answer_steps(), ids=list(answers.values_list('pk', flat=True)), batch_size=batch_size)
+    _changed(survey_ids)
+    return deleted
+
+
+def purge_questions(questions, batch_size=1000):
+    """
+    Delete the questions of the queryset with their answers like purge_answers(). Returns the number
+    of deleted rows.
+    """
+    questions = questions.order_by()
+    survey_ids = set(questions.values_list('survey_id', flat=True))
+    ids = list(questions.values_list('pk', flat=True))
+    answer_ids = list(Answer.objects.filter(question_id__in=ids).values_list('pk', flat=True))
+    deleted = _delete_rows(answer_steps(), ids=answer_ids, batch_size=batch_size)
+    deleted += _delete_rows([(f'SELECT id FROM {_table(Question)} WHERE id = ANY(%s) LIMIT %s',
+                              [f'DELETE FROM {_table(Question)} WHERE id = ANY(%s)'])], ids=ids, batch_size=batch_size)
+    _changed(survey_ids)
+    return deleted
@@ -0,0 +1,77 @@
+"""
+Hourly and daily rollups of the submissions, which the time-series endpoint reads instead of the raw
+submissions and selections.
+
+roll_up() aggregates the submissions stored after the high-water mark into ResponseRollup buckets and
+moves the mark, all in one transaction, so every committed submission below the mark is counted exactly
+once. The mark row is locked, so concurrent runs wait for each other.
+"""
+from datetime import timedelta, timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import Now, Trunc
+
+from .models import ResponseRollup, RollupMark, Selection, Submission
+
+MARK_NAME = 'responses'
+
+
+def _bucket_counts(submissions, period):
+    """
+    {(survey_id, bucket, answer_id): count} of the submissions (answer_id None) and their selections.
+    """
+    bucket = Trunc('submitted_at', period, tzinfo=dt_timezone.utc)
+    counts = {(survey, start, None): count for survey, start, count in
+              submissions.annotate(bucket=bucket).values_list('survey_id', 'bucket')
+              .annotate(count=Count('*')).order_by()}
+    selections = Selection.objects.filter(submission__in=submissions).annotate(
+        bucket=Trunc('submission__submitted_at', period, tzinfo=dt_timezone.utc))
+    counts.update({(survey, start, answer): count for survey, start, answer, count in
+                   selections.values_list('submission__survey_id', 'bucket', 'answer_id')
+                   .annotate(count=Count('*')).order_by()})
+    return counts
+
+
+def _add_counts(period, counts):
+    """
+    Add the counts to the stored buckets of the period, with one read and one upsert.
+    """
+    stored = ResponseRollup.objects.filter(period=period, survey_id__in={survey for survey, _, _ in counts},
+                                           bucket__in={bucket for _, bucket, _ in counts})
+    for rollup in stored:
+        key = (rollup.survey_id, rollup.bucket, rollup.answer_id)
+        if key in counts:
+            counts[key] += rollup.count
+    ResponseRollup.objects.bulk_create(
+        [ResponseRollup(survey_id=survey, period=period, bucket=bucket, answer_id=answer, count=count)
+         for (survey, bucket, answer), count in counts.items()],
+        update_conflicts=True, unique_fields=['survey', 'period', 'bucket', 'answer'], update_fields=['count'])
+
+
+def roll_up(batch_size=10000, delay=60):
+    """
+    Aggregate the next batch of submissions after the mark, returns how many were aggregated.
+
+    The ids are allocated when a row is inserted but the row is visible only once its transaction commits,
+    so a drain batch may commit lower ids after higher ones. The batch therefore stops before the first
+    submission stored less than delay seconds ago (by the database clock, stored_at), so the mark never
+    passes a submission whose transaction may still be running. The delay must exceed the longest
+    transaction which stores submissions.
+    """
+    with transaction.atomic():
+        mark, _ = RollupMark.objects.select_for_update().get_or_create(name=MARK_NAME)
+        after_mark = Submission.objects.filter(pk__gt=mark.submission_id).order_by('pk')
+        young = (after_mark.filter(stored_at__gt=Now() - timedelta(seconds=delay))
+                 .values_list('pk', flat=True).first())
+        if young is not None:
+            after_mark = after_mark.filter(pk__lt=young)
+        ids = list(after_mark.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return 0
+        submissions = Submission.objects.filter(pk__in=ids)
+        for period in ResponseRollup.Period.values:
+            _add_counts(period=period, counts=_bucket_counts(submissions=submissions, period=period))
+        mark.submission_id = ids[-1]
+        mark.save(update_fields=['submission_id', 'updated_at'])
+    return len(ids)
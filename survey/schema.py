@@ -0,0 +1,81 @@
+"""
+Frozen schema of a survey: the question and answer ids with the question types, plus the detail page.
+
+PublishedSurvey compiles it into Survey.schema when the survey is published, since a published survey
+can't change afterwards. Submit validation and the detail endpoint read it instead of the ORM, and every
+process keeps the loaded schemas in a small LRU keyed by survey and compile stamp.
+"""
+import time
+
+from django.db.models import Prefetch
+
+from django_project.cache import LRUCache
+
+from .cache import survey_schema_cache
+from .models import Answer
+
+
+class QuestionSchema:
+    __slots__ = ('pk', 'question', 'question_type', 'answers')
+
+    def __init__(self, pk, question, question_type, answers):
+        self.pk = pk
+        self.question = question
+        self.question_type = question_type
+        self.answers = frozenset(answers)
+
+
+class SurveySchema:
+    __slots__ = ('questions', 'answers', 'detail')
+
+    def __init__(self, blob):
+        self.detail = blob['detail']
+        self.questions = {question['pk']: QuestionSchema(pk=question['pk'], question=question['question'],
+                                                         question_type=question['question_type'],
+                                                         answers=[answer['pk'] for answer in question['answers']])
+                          for question in self.detail['question']}
+        self.answers = {answer: question.pk for question in self.questions.values() for answer in question.answers}
+
+
+def compile_schema(survey):
+    """
+    The JSON blob of the schema, built with two queries.
+    """
+    questions = survey.question.order_by('pk').prefetch_related(
+        Prefetch('answers', queryset=Answer.objects.order_by('pk')))
+    return {
+        'compiled_at': time.time_ns(),
+        'detail': {
+            'title': survey.title,
+            'description': survey.description,
+            'question': [{
+                'pk': question.pk,
+                'question': question.question,
+                'question_type': question.question_type,
+                'answers': [{'pk': answer.pk, 'answer': answer.answer} for answer in question.answers.all()],
+            } for question in questions],
+        },
+    }
+
+
+_schemas = LRUCache(maxsize=1024)
+
+
+def load_schema(survey):
+    """
+    The schema of the survey. Surveys without a stored schema (drafts) have it compiled and cached
+    until they change.
+    """
+    blob = survey.schema
+    if blob is None:
+        version = survey_schema_cache.get_version(slug=survey.slug)
+        blob = survey_schema_cache.get(slug=survey.slug, version=version)
+        if blob is None:
+            blob = compile_schema(survey=survey)
+            survey_schema_cache.set(slug=survey.slug, version=version, content=blob)
+    key = (survey.pk, blob['compiled_at'])
+    schema = _schemas.get(key)
+    if schema is None:
+        schema = SurveySchema(blob)
+        _schemas.add(key, schema)
+    return schema
@@ -0,0 +1,43 @@
+"""
+Full-text search over the published surveys.
+
+Every published survey keeps a weighted tsvector of its title (A), description (B) and question texts (C)
+in search_vector, which a partial GIN index over the published surveys serves. update_search_vectors()
+rebuilds the vectors of a queryset with one UPDATE; the signals call it when a published survey is saved
+and when its questions change. Drafts aren't searched, so their vectors are left alone until published.
+This is PostgreSQL only, like the rest of the project.
+"""
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db.models import F, OuterRef, Subquery, TextField, Value
+from django.db.models.functions import Coalesce
+
+from .models import Question
+
+SEARCH_CONFIG = 'english'
+
+
+def search_vector_expression(question_model):
+    """
+    The weighted search vector of a survey, the question texts aggregated by a subquery.
+    """
+    questions = (question_model.objects.filter(survey=OuterRef('pk')).order_by().values('survey')
+                 .annotate(text=StringAgg('question', ' ')).values('text'))
+    return (SearchVector('title', weight='A', config=SEARCH_CONFIG)
+            + SearchVector('description', weight='B', config=SEARCH_CONFIG)
+            + SearchVector(Coalesce(Subquery(questions), Value(''), output_field=TextField()), weight='C',
+                           config=SEARCH_CONFIG))
+
+
+def update_search_vectors(surveys):
+    return surveys.update(search_vector=search_vector_expression(question_model=Question))
+
+
+def search_surveys(queryset, text):
+    """
+    The surveys of the queryset matching the web search syntax text ("quoted phrases", or, -excluded),
+    best ranked first.
+    """
+    query = SearchQuery(text, search_type='websearch', config=SEARCH_CONFIG)
+    return (queryset.filter(search_vector=query).annotate(rank=SearchRank(F('search_vector'), query))
+            .order_by('-rank', '-created_at', '-id'))
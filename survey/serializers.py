@@ -1,9 +1,19 @@
-from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.db.models import Count
+from django.template.defaultfilters import slugify
 
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
+from rest_framework.validators import UniqueValidator
 
-from .models import Survey, Question, Answer
+from django_project.instrumentation import TimedSerializerMixin
+
+from .models import Survey, Question, Answer, ResponseRollup
+from .schema import compile_schema, load_schema
+
+# the title is unique among the surveys which are not deleted, a conditional constraint DRF doesn't pick up
+UNIQUE_TITLE = {'validators': [UniqueValidator(queryset=Survey.objects.all(),
+                                               message='survey with this title already exists.')]}
 
 
 # survey serializers
@@ -17,18 +27,7 @@ class SurveyCreateSerializer(serializers.ModelSerializer):
             'title',
             'description'
         )
-
-
-class SurveyListSerializer(serializers.ModelSerializer):
-    absolute_url = serializers.URLField(read_only=True, source='get_absolute_url')
-
-    class Meta:
-        model = Survey
-        fields = (
-            'title',
-            'description',
-            'absolute_url'
-        )
+        extra_kwargs = {'title': UNIQUE_TITLE}
 
 
 class SurveyUpdateSerializer(serializers.ModelSerializer):
@@ -38,6 +37,7 @@ class SurveyUpdateSerializer(serializers.ModelSerializer):
             'title',
             'description',
         )
+        extra_kwargs = {'title': UNIQUE_TITLE}
 
 
 class SurveyPublishedSerializer(serializers.ModelSerializer):
@@ -47,98 +47,34 @@ class SurveyPublishedSerializer(serializers.ModelSerializer):
             'published',
         )
 
-    def check_survey_having_questions(self, instance):
-        if not instance.question.all().exists():
+    def check_survey_having_questions(self, questions):
+        if not questions:
             raise ValidationError({'published': 'The survey cannot be published without questions!'})
 
-    def check_all_questions(self, instance):
-        questions = instance.question.all()
-        for question in questions:
-            if question.question_type == 'BINARY' and len(question.answers.all()) != 2:
-                raise ValidationError({'question': f'The question ({question.pk}) have to have only 2 answers!'})
-            elif len(question.answers.all()) < 2:
-                raise ValidationError({'question': f'The question ({question.pk}) have to have more questions!'})
+    def check_all_questions(self, questions):
+        errors = []
+        for pk, question_type, answers_count in questions:
+            if question_type == 'BINARY' and answers_count != 2:
+                errors.append(f'The question ({pk}) have to have only 2 answers!')
+            elif answers_count < 2:
+                errors.append(f'The question ({pk}) have to have more answers!')
+        if errors:
+            raise ValidationError({'question': errors})
 
     def update(self, instance, validated_data):
-        self.check_survey_having_questions(instance=instance)
-        self.check_all_questions(instance=instance)
+        if validated_data.get('published'):
+            # one grouped query: the type and the answers count of every question
+            questions = list(instance.question.order_by('pk').annotate(answers_count=Count('answers'))
+                             .values_list('pk', 'question_type', 'answers_count'))
+            self.check_survey_having_questions(questions=questions)
+            self.check_all_questions(questions=questions)
+            instance.schema = compile_schema(survey=instance)  # a published survey can't change anymore
+        else:
+            instance.schema = None
         return super().update(instance=instance, validated_data=validated_data)
 
 
-class ShowSurveyDetailSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = Survey
-        fields = (
-            'title',
-            'description',
-            'question',
-        )
-
-    def to_representation(self, instance):
-        order_dict = super().to_representation(instance=instance)
-        questions = QuestionSerializer(data=instance.question, many=True)
-        questions.is_valid()
-        order_dict['question'] = questions.data  # rewrite the answers id to question data
-        return order_dict
-
-
-class SurveyStatisticSerializer(serializers.ModelSerializer):
-    passed_users = serializers.IntegerField(read_only=True, source='how_many_user_passes')
-
-    class Meta:
-        model = Survey
-        fields = (
-            'title',
-            'description',
-            'question',
-            'passed_users'
-        )
-
-    def to_representation(self, instance):
-        order_dict = super().to_representation(instance=instance)
-        questions = QuestionStatisticSerializer(data=instance.question.all(), many=True)
-        questions.is_valid()
-        order_dict['question'] = questions.data  # rewrite the answers id to question data
-        return order_dict
-
-
 # questions serializers
-class QuestionSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = Question
-        fields = (
-            'pk',
-            'question',
-            'question_type',
-            'answers'
-        )
-
-    def to_representation(self, instance):
-        order_dict = super().to_representation(instance=instance)
-        answers = AnswerSerializer(data=instance.answers, many=True)
-        answers.is_valid()
-        order_dict['answers'] = answers.data  # rewrite the answers id to answers data
-        return order_dict
-
-
-class QuestionStatisticSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = Question
-        fields = (
-            'pk',
-            'question',
-            'question_type',
-            'answers'
-        )
-
-    def to_representation(self, instance):
-        order_dict = super().to_representation(instance=instance)
-        answers = AnswerStatisticSerializer(data=instance.answers, many=True)
-        answers.is_valid()
-        order_dict['answers'] = answers.data  # rewrite the answers id to answers data
-        return order_dict
-
-
 class QuestionCreateSerializer(serializers.ModelSerializer):
     survey = serializers.PrimaryKeyRelatedField(read_only=True)
 
@@ -151,75 +87,197 @@ class QuestionCreateSerializer(serializers.ModelSerializer):
         )
 
 
-class QuestionSubmitSerializer(serializers.ModelSerializer):
+class QuestionSubmitSerializer(serializers.Serializer):
     question_id = serializers.IntegerField(required=True)
+    answers = serializers.ListField(child=serializers.IntegerField(), allow_empty=True)
 
-    class Meta:
-        model = Question
-        fields = (
-            'question_id',
-            'answers'
-        )
 
-    def _check_if_question_in_survey(self, survey, question):
-        if question not in survey.question.all():
+class SurveySubmitSerializer(serializers.Serializer):
+    answers = QuestionSubmitSerializer(many=True)
+
+    def _check_if_question_in_survey(self, schema, question_id):
+        if question_id not in schema.questions:
             raise ValidationError({'question': "The question doesn't belong to this survey!"})
 
+    def _check_if_question_is_repeated(self, seen, question_id):
+        if question_id in seen:
+            raise ValidationError({'question': f'The question ({question_id}) was answered more than once!'})
+
     def _check_if_answers_is_empty(self, question, answers):
         if not answers:
             raise ValidationError({'question': f'The {question.question} is required question!'})
 
     def _check_answer_to_question(self, question, answers):
-        for answer in answers:
-            if answer.question != question:
-                raise ValidationError({'answer': "The answer doesn't belong to this question!"})
+        if not answers <= question.answers:
+            raise ValidationError({'answer': "The answer doesn't belong to this question!"})
 
     def _check_amount_of_answers(self, question, answers):
-        if (question.question_type == 'BINARY' and len(answers) > 1) or (
-                question.question_type == 'DEFAULT' and len(answers) > 1):
+        if question.question_type in ('BINARY', 'DEFAULT') and len(answers) > 1:
             raise ValidationError({'question': f'The question {question.question} can have only one answer!'})
 
     def validate(self, attrs):
         """
-        attrs have to have such data as: {'question_id': id, 'answers': [AnswerModel, ...]
+        attrs have to have such data as: {'answers': [{'question_id': id, 'answers': [id, ...]}, ...]}
         """
-        question = get_object_or_404(Question, pk=attrs.get('question_id'))
-        answers = attrs.get('answers')
-        survey = self.context.get('survey')  # getting the survey from context
-        self._check_if_question_in_survey(survey=survey, question=question)
-        self._check_if_answers_is_empty(question=question, answers=answers)
-        self._check_amount_of_answers(question=question, answers=answers)
-        self._check_answer_to_question(question=question, answers=answers)
+        schema = load_schema(survey=self.context.get('survey'))  # the survey from context
+        seen = set()
+        for item in attrs.get('answers'):
+            question_id, answers = item.get('question_id'), set(item.get('answers'))
+            self._check_if_question_in_survey(schema=schema, question_id=question_id)
+            self._check_if_question_is_repeated(seen=seen, question_id=question_id)
+            seen.add(question_id)
+            question = schema.questions[question_id]
+            self._check_if_answers_is_empty(question=question, answers=answers)
+            self._check_amount_of_answers(question=question, answers=answers)
+            self._check_answer_to_question(question=question, answers=answers)
+            item['answers'] = sorted(answers)
         return super().validate(attrs)
 
 
 # answer serializers
-class AnswerSerializer(serializers.ModelSerializer):
+class AnswerCreateSerializer(serializers.ModelSerializer):
+    question = serializers.PrimaryKeyRelatedField(read_only=True)
+
     class Meta:
         model = Answer
         fields = (
-            'pk',
+            'question',
             'answer'
         )
 
 
-class AnswerStatisticSerializer(serializers.ModelSerializer):
-    user_answered = serializers.IntegerField(read_only=True, source='how_many_user_answered')
+# read serializers, which build plain dicts without the field introspection of ModelSerializer
+class SurveyListReadSerializer(TimedSerializerMixin, serializers.BaseSerializer):
+    """
+    The title, the description with the include_description context and the absolute url of a survey.
+    """
 
+    def to_representation(self, instance):
+        data = {'title': instance.title}
+        if self.context.get('include_description'):
+            data['description'] = instance.description
+        data['absolute_url'] = instance.get_absolute_url()
+        return data
+
+
+class SurveyStatisticReadSerializer(TimedSerializerMixin, serializers.BaseSerializer):
+    """
+    The survey with its questions, the answers and their counters, expects the prefetched question tree.
+    """
+
+    def to_representation(self, instance):
+        return {
+            'title': instance.title,
+            'description': instance.description,
+            'question': [{
+                'pk': question.pk,
+                'question': question.question,
+                'question_type': question.question_type,
+                'answers': [{'answer': answer.answer, 'user_answered': answer.answered_count}
+                            for answer in question.answers.all()],
+            } for question in instance.question.all()],
+            'passed_users': instance.passed_count,
+        }
+
+
+# survey tree serializers
+class AnswerTreeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Answer
         fields = (
-            'answer',
-            'user_answered'
+            'pk',
+            'answer'
         )
 
 
-class AnswerCreateSerializer(serializers.ModelSerializer):
-    question = serializers.PrimaryKeyRelatedField(read_only=True)
+class QuestionTreeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    answers = AnswerTreeSerializer(many=True, max_length=100)
 
     class Meta:
-        model = Answer
+        model = Question
         fields = (
+            'pk',
             'question',
-            'answer'
+            'question_type',
+            'answers'
         )
+
+
+class SurveyTreeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """
+    A whole survey with its questions and their answers, e.g.
+    {
+        "title": "Survey",
+        "description": "About the survey",
+        "question": [
+            {"question": "Question", "question_type": "DEFAULT", "answers": [{"answer": "Yes"}, {"answer": "No"}]}
+        ]
+    }
+    It is created as a draft with one bulk insert per table, and the export of a survey can be imported again.
+    """
+    question = QuestionTreeSerializer(many=True, max_length=500)
+
+    class Meta:
+        model = Survey
+        fields = (
+            'slug',
+            'title',
+            'description',
+            'question'
+        )
+        read_only_fields = ('slug',)
+        extra_kwargs = {'title': UNIQUE_TITLE}
+
+    @transaction.atomic
+    def create(self, validated_data):
+        questions = validated_data.pop('question')
+        survey = Survey(**validated_data, slug=slugify(validated_data.get('title')))
+        Survey.objects.bulk_create([survey])
+        created = Question.objects.bulk_create(
+            [Question(survey=survey, question=data.get('question'),
+                      question_type=data.get('question_type', Question.QuestionType.DEFAULT)) for data in questions])
+        Answer.objects.bulk_create([Answer(question=question, answer=answer.get('answer'))
+                                    for question, data in zip(created, questions) for answer in data.get('answers')])
+        return survey
+
+
+# statistic serializers
+class StatisticQuerySerializer(serializers.Serializer):
+    """
+    Query parameters of the statistic query endpoint, e.g.
+    ?question=5&crosstab=2,5&answer=7&since=2024-01-01T00:00&until=2024-02-01T00:00
+    """
+    question = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    crosstab = serializers.ListField(child=serializers.RegexField(r'^\d+,\d+$'), required=False, default=list)
+    answer = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    since = serializers.DateTimeField(required=False, default=None)
+    until = serializers.DateTimeField(required=False, default=None)
+
+    def validate_crosstab(self, value):
+        return [tuple(int(question) for question in pair.split(',')) for pair in value]
+
+    def validate(self, attrs):
+        schema = load_schema(survey=self.context.get('survey'))
+        asked = set(attrs.get('question')) | {question for pair in attrs.get('crosstab') for question in pair}
+        if not asked <= schema.questions.keys():
+            raise ValidationError({'question': "The question doesn't belong to this survey!"})
+        if not set(attrs.get('answer')) <= schema.answers.keys():
+            raise ValidationError({'answer': "The answer doesn't belong to this survey!"})
+        return super().validate(attrs)
+
+
+class SearchQuerySerializer(serializers.Serializer):
+    """
+    Query parameters of the search endpoint, e.g. ?q="customer satisfaction" -internal
+    """
+    q = serializers.CharField(max_length=200)
+
+
+class TimeSeriesQuerySerializer(serializers.Serializer):
+    """
+    Query parameters of the time-series endpoint, e.g. ?period=hour&since=2024-01-01T00:00&until=2024-01-02T00:00
+    """
+    period = serializers.ChoiceField(choices=ResponseRollup.Period.choices, required=False,
+                                     default=ResponseRollup.Period.DAY)
+    since = serializers.DateTimeField(required=False, default=None)
+    until = serializers.DateTimeField(required=False, default=None)
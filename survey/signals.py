@@ -0,0 +1,96 @@
+from functools import partial
+from threading import local
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .cache import survey_detail_cache
+from .models import Survey, Question, Answer
+from .schema import compile_schema
+from .search import update_search_vectors
+
+# the surveys whose compile is queued in the current transaction of the thread, by its transaction id,
+# so the ids queued in a transaction which was rolled back are dropped with the next one
+_scheduled = local()
+
+
+def schedule_schema_compile(survey_id):
+    """
+    Recompile the schema of a published survey once the transaction commits, e.g. after admin edits;
+    many changes of the same survey in one transaction compile it only once.
+    """
+    connection = transaction.get_connection()
+    if connection.in_atomic_block:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT txid_current()')
+            txid = cursor.fetchone()[0]
+        if getattr(_scheduled, 'txid', None) != txid:
+            _scheduled.txid, _scheduled.survey_ids = txid, set()
+        if survey_id in _scheduled.survey_ids:
+            return
+        _scheduled.survey_ids.add(survey_id)
+    transaction.on_commit(partial(compile_published_schema, survey_id=survey_id))
+
+
+def compile_published_schema(survey_id):
+    getattr(_scheduled, 'survey_ids', set()).discard(survey_id)
+    survey = Survey.is_published.filter(pk=survey_id).first()
+    if survey is not None:
+        Survey.objects.filter(pk=survey_id).update(schema=compile_schema(survey=survey), changed_at=timezone.now())
+        update_search_vectors(Survey.objects.filter(pk=survey_id))
+        survey_detail_cache.invalidate(slug=survey.slug)
+
+
+@receiver([post_save, post_delete], sender=Survey)
+def invalidate_survey(sender, instance, **kwargs):
+    survey_detail_cache.invalidate(slug=instance.slug)
+
+
+@receiver(pre_save, sender=Survey)
+def invalidate_renamed_survey(sender, instance, **kwargs):
+    # a new title gives the survey a new slug, the entries cached under the old one must go too
+    if instance.pk is not None:
+        slug = Survey.all_objects.filter(pk=instance.pk).values_list('slug', flat=True).first()
+        if slug is not None and slug != instance.slug:
+            survey_detail_cache.invalidate(slug=slug)
+
+
+def is_schema_outdated(survey):
+    detail = survey.schema['detail']
+    return detail['title'] != survey.title or detail['description'] != survey.description
+
+
+@receiver(post_save, sender=Survey)
+def sync_survey_schema(sender, instance, **kwargs):
+    # the survey was published, unpublished or edited without PublishedSurvey, e.g. in the admin
+    if instance.published and (instance.schema is None or is_schema_outdated(instance)):
+        schedule_schema_compile(survey_id=instance.pk)
+    elif not instance.published and instance.schema is not None:
+        Survey.objects.filter(pk=instance.pk).update(schema=None)
+
+
+@receiver(post_save, sender=Survey)
+def sync_search_vector(sender, instance, **kwargs):
+    # the title or description may have changed; questions are indexed as they are when it's saved
+    if instance.published:
+        update_search_vectors(Survey.objects.filter(pk=instance.pk))
+
+
+@receiver([post_save, post_delete], sender=Question)
+def invalidate_question_survey(sender, instance, **kwargs):
+    survey = instance.survey
+    Survey.all_objects.filter(pk=survey.pk).update(changed_at=timezone.now())
+    survey_detail_cache.invalidate(slug=survey.slug)
+    if survey.published:
+        schedule_schema_compile(survey_id=survey.pk)
+
+
+@receiver([post_save, post_delete], sender=Answer)
+def invalidate_answer_survey(sender, instance, **kwargs):
+    survey = instance.question.survey
+    Survey.all_objects.filter(pk=survey.pk).update(changed_at=timezone.now())
+    survey_detail_cache.invalidate(slug=survey.slug)
+    if survey.published:
+        schedule_schema_compile(survey_id=survey.pk)
@@ -0,0 +1,85 @@
+"""
+Filtered and cross-tabulated statistics of the submissions of a survey. Every figure is computed by
+one grouped SQL aggregate over the selections; the answers nobody chose are filled in from the survey
+schema. The time-series are read from the hourly and daily rollups instead, see rollups.py.
+"""
+from django.db.models import Count, Exists, OuterRef
+
+from .models import ResponseRollup, Submission, Selection
+from .schema import load_schema
+
+
+def filtered_submissions(survey, answers=(), since=None, until=None):
+    """
+    Submissions of the survey which chose every one of the answers (ids) within [since, until).
+    """
+    submissions = Submission.objects.filter(survey=survey)
+    if since is not None:
+        submissions = submissions.filter(submitted_at__gte=since)
+    if until is not None:
+        submissions = submissions.filter(submitted_at__lt=until)
+    for answer in answers:
+        submissions = submissions.filter(Exists(Selection.objects.filter(submission=OuterRef('pk'), answer_id=answer)))
+    return submissions
+
+
+def question_answers(survey, question_id):
+    return sorted(load_schema(survey=survey).questions[question_id].answers)
+
+
+def answer_distribution(survey, question_id, submissions):
+    counts = dict(Selection.objects.filter(question_id=question_id, submission__in=submissions)
+                  .values_list('answer_id').annotate(count=Count('*')).order_by())
+    return {
+        'question': question_id,
+        'answers': [{'answer': answer, 'count': counts.get(answer, 0)}
+                    for answer in question_answers(survey=survey, question_id=question_id)],
+    }
+
+
+def crosstab(survey, row_question_id, column_question_id, submissions):
+    """
+    How many submissions chose each (row answer, column answer) pair of the two questions.
+    """
+    counts = {(row, column): count for row, column, count in
+              Selection.objects.filter(question_id=row_question_id, submission__in=submissions,
+                                       submission__selections__question_id=column_question_id)
+              .values_list('answer_id', 'submission__selections__answer_id').annotate(count=Count('*')).order_by()}
+    columns = question_answers(survey=survey, question_id=column_question_id)
+    return {
+        'rows': row_question_id,
+        'columns': column_question_id,
+        'cells': [{'row': row, 'column': column, 'count': counts.get((row, column), 0)}
+                  for row in question_answers(survey=survey, question_id=row_question_id) for column in columns],
+    }
+
+
+def survey_statistics(survey, questions=(), crosstabs=(), answers=(), since=None, until=None):
+    submissions = filtered_submissions(survey=survey, answers=answers, since=since, until=until)
+    return {
+        'respondents': submissions.count(),
+        'distributions': [answer_distribution(survey=survey, question_id=question, submissions=submissions)
+                          for question in questions],
+        'crosstabs': [crosstab(survey=survey, row_question_id=row, column_question_id=column, submissions=submissions)
+                      for row, column in crosstabs],
+    }
+
+
+def response_timeseries(survey, period, since=None, until=None):
+    """
+    Submissions and selections of each answer of the survey per bucket of the period within [since, until),
+    read from the rollups with one range query on the unique (survey, period, bucket, answer) index.
+    """
+    rollups = ResponseRollup.objects.filter(survey=survey, period=period)
+    if since is not None:
+        rollups = rollups.filter(bucket__gte=since)
+    if until is not None:
+        rollups = rollups.filter(bucket__lt=until)
+    buckets = {}
+    for bucket, answer, count in rollups.order_by('bucket').values_list('bucket', 'answer_id', 'count'):
+        point = buckets.setdefault(bucket, {'bucket': bucket, 'responses': 0, 'answers': {}})
+        if answer is None:
+            point['responses'] = count
+        else:
+            point['answers'][answer] = count
+    return {'period': period, 'buckets': list(buckets.values())}
@@ -1,3 +1,985 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
+from urllib.parse import parse_qs, urlsplit
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+import yaml
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, OperationalError, connection, connections
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APITestCase
+
+from django_project.instrumentation import Histogram, endpoint_metrics
+from django_project.renderers import FastJSONParser, FastJSONRenderer
+from django_project.routers import ReplicaPinningMiddleware, ReplicaRouter, use_primary
+
+from . import serializers
+from .benchmark import rolled_back
+from .cache import passed_survey_cache, survey_detail_cache
+from .management.commands.benchmark_json import SurveyListSerializer, SurveyStatisticSerializer
+from .management.commands.drain_submissions import Command as DrainCommand
+from .schema import compile_schema
+from .signals import schedule_schema_compile
+from .models import (Survey, Question, Answer, Submission, Selection, PendingSubmission, ResponseRollup,
+                     RollupMark, SurveyPurge)
+from .pagination import keyset_filter
+from .purge import mark_deleted, purge_answers
+from .rollups import roll_up
+from .views import QUESTION_TREE
+
+
+class SurveyTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        passed_survey_cache.local.clear()
+        self.owner = get_user_model().objects.create_user(username='owner', password='password')
+        self.user = get_user_model().objects.create_user(username='user', password='password')
+
+    def create_survey(self, title='Survey', questions=3, answers=3, published=True):
+        survey = Survey.objects.create(owner=self.owner, title=title, description='Description',
+                                       published=published)
+        for number in range(questions):
+            question = Question.objects.create(survey=survey, question=f'Question {number}')
+            Answer.objects.bulk_create([Answer(question=question, answer=f'Answer {number}.{choice}')
+                                        for choice in range(answers)])
+        if published:  # what PublishedSurvey stores
+            survey.schema = compile_schema(survey=survey)
+            survey.save()
+        return survey
+
+    def submit_payload(self, survey):
+        return {'answers': [{'question_id': question.pk, 'answers': [question.answers.first().pk]}
+                            for question in survey.question.all()]}
+
+
+class SurveySubmitTestCase(SurveyTestCase):
+    def submit(self, survey, payload):
+        self.client.force_authenticate(self.user)
+        return self.client.post(f'/survey/submit/{survey.slug}/', payload, format='json')
+
+    def test_submit_stores_answers_and_pass(self):
+        survey = self.create_survey()
+        response = self.submit(survey, self.submit_payload(survey))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Submission.objects.filter(survey=survey).count(), 1)
+        survey.refresh_from_db()
+        self.assertEqual(survey.passed_count, 1)
+        self.assertEqual(Selection.objects.filter(submission__user=self.user).count(), 3)
+
+    def test_submit_twice_is_forbidden(self):
+        survey = self.create_survey()
+        self.submit(survey, self.submit_payload(survey))
+        response = self.submit(survey, self.submit_payload(survey))
+        self.assertEqual(response.status_code, 403)
+
+    def test_repeated_submit_is_rejected_from_cache(self):
+        survey = self.create_survey()
+        payload = self.submit_payload(survey)
+        self.submit(survey, payload)
+        with self.assertNumQueries(1):  # only the survey lookup
+            response = self.submit(survey, payload)
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(SURVEY_ASYNC_INGEST=True)
+    def test_async_submit_is_stored_by_drain(self):
+        survey = self.create_survey()
+        payload = self.submit_payload(survey)
+        response = self.submit(survey, payload)
+        self.assertEqual(response.status_code, 202)
+        self.assertFalse(Submission.objects.exists())
+        passed_survey_cache.local.clear()
+        self.assertEqual(self.submit(survey, payload).status_code, 403)  # rejected by the outbox
+        call_command('drain_submissions', stdout=StringIO())
+        self.assertFalse(PendingSubmission.objects.exists())
+        survey.refresh_from_db()
+        self.assertEqual(survey.passed_count, 1)
+        self.assertEqual(Selection.objects.filter(submission__user=self.user).count(), 3)
+
+    @override_settings(SURVEY_ASYNC_INGEST=True)
+    def test_drain_skips_deleted_survey(self):
+        survey = self.create_survey()
+        self.submit(survey, self.submit_payload(survey))
+        Survey.objects.filter(pk=survey.pk).update(deleted_at=datetime.now(dt_timezone.utc))
+        call_command('drain_submissions', stdout=StringIO())
+        self.assertFalse(PendingSubmission.objects.exists())
+        self.assertFalse(Submission.objects.exists())
+        self.assertEqual(Survey.all_objects.get(pk=survey.pk).passed_count, 0)
+
+    @override_settings(SURVEY_ASYNC_INGEST=True)
+    def test_drain_retries_failed_batch(self):
+        survey = self.create_survey()
+        self.submit(survey, self.submit_payload(survey))
+        drain = DrainCommand.drain
+        calls = []
+
+        def flaky(command, batch_size):
+            calls.append(batch_size)
+            if len(calls) == 1:
+                raise OperationalError('deadlock detected')
+            return drain(command, batch_size=batch_size)
+
+        with mock.patch.object(DrainCommand, 'drain', flaky):
+            call_command('drain_submissions', stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(len(calls), 3)  # failed, drained one, found the outbox empty
+        self.assertEqual(Submission.objects.count(), 1)
+
+    @override_settings(SURVEY_ASYNC_INGEST=True)
+    def test_drain_drops_selections_of_deleted_answers(self):
+        survey = self.create_survey()
+        self.submit(survey, self.submit_payload(survey))
+        self.client.force_authenticate(self.owner)
+        self.client.post(f'/survey/submit/{survey.slug}/', self.submit_payload(survey), format='json')
+        purge_answers(Answer.objects.filter(pk=self.submit_payload(survey)['answers'][0]['answers'][0]))
+        call_command('drain_submissions', stdout=StringIO())
+        self.assertFalse(PendingSubmission.objects.exists())
+        self.assertEqual(Submission.objects.filter(survey=survey).count(), 2)
+        self.assertEqual(Selection.objects.filter(submission__survey=survey).count(), 2 * 2)
+
+    @override_settings(SURVEY_ASYNC_INGEST=True)
+    def test_drain_sets_failing_row_aside(self):
+        survey = self.create_survey()
+        self.submit(survey, self.submit_payload(survey))
+        self.client.force_authenticate(self.owner)
+        self.client.post(f'/survey/submit/{survey.slug}/', self.submit_payload(survey), format='json')
+        record_many = Submission.objects.record_many
+
+        def failing(submissions):
+            if any(submission.user_id == self.owner.pk for submission in submissions):
+                raise IntegrityError('violates foreign key constraint')
+            return record_many(submissions)
+
+        with mock.patch.object(Submission.objects, 'record_many', failing):
+            call_command('drain_submissions', stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(list(Submission.objects.values_list('user', flat=True)), [self.user.pk])
+        failed = PendingSubmission.objects.get()
+        self.assertEqual((failed.user_id, failed.error), (self.owner.pk, 'violates foreign key constraint'))
+        self.assertIsNotNone(failed.failed_at)
+        call_command('drain_submissions', stdout=StringIO())  # the failed row is not tried again
+        self.assertEqual(Submission.objects.count(), 1)
+
+    def test_submit_rejects_answer_of_other_question(self):
+        survey = self.create_survey()
+        first, second = survey.question.all()[:2]
+        payload = {'answers': [{'question_id': first.pk, 'answers': [second.answers.first().pk]}]}
+        response = self.submit(survey, payload)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Selection.objects.exists())
+
+    def test_submit_rejects_several_answers_to_default_question(self):
+        survey = self.create_survey(questions=1)
+        question = survey.question.get()
+        payload = {'answers': [{'question_id': question.pk,
+                                'answers': list(question.answers.values_list('pk', flat=True))}]}
+        response = self.submit(survey, payload)
+        self.assertEqual(response.status_code, 400)
+
+    def test_submit_query_count_is_flat(self):
+        counts = []
+        for title, questions in (('Small', 5), ('Large', 40)):
+            survey = self.create_survey(title=title, questions=questions)
+            payload = self.submit_payload(survey)
+            with CaptureQueriesContext(connection) as context:
+                response = self.submit(survey, payload)
+            self.assertEqual(response.status_code, 200)
+            counts.append(len(context))
+        self.assertEqual(counts[0], counts[1])
+
+
+class SurveyStatisticTestCase(SurveyTestCase):
+    def test_statistic_uses_counters(self):
+        survey = self.create_survey()
+        self.client.force_authenticate(self.user)
+        self.client.post(f'/survey/submit/{survey.slug}/', self.submit_payload(survey), format='json')
+        self.client.force_authenticate(self.owner)
+        response = self.client.get(f'/survey/statistic/{survey.slug}/')
+        self.assertEqual(response.data['passed_users'], 1)
+        self.assertEqual(sorted(answer['user_answered'] for question in response.data['question']
+                                for answer in question['answers']), [0, 0, 0, 0, 0, 0, 1, 1, 1])
+
+    def test_statistic_query_count_is_flat(self):
+        counts = []
+        for title, questions in (('Small', 2), ('Large', 20)):
+            survey = self.create_survey(title=title, questions=questions)
+            self.client.force_authenticate(self.owner)
+            with CaptureQueriesContext(connection) as context:
+                self.client.get(f'/survey/statistic/{survey.slug}/')
+            counts.append(len(context))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_rebuild_counters(self):
+        survey = self.create_survey()
+        answer = survey.question.first().answers.first()
+        submission = Submission.objects.create(survey=survey, user=self.user)
+        Selection.objects.create(submission=submission, question=answer.question, answer=answer)
+        call_command('rebuild_survey_counters', stdout=StringIO())
+        answer.refresh_from_db()
+        survey.refresh_from_db()
+        self.assertEqual((answer.answered_count, survey.passed_count), (1, 1))
+
+
+class SurveyDetailTestCase(SurveyTestCase):
+    def test_detail_returns_question_tree(self):
+        survey = self.create_survey(questions=2, answers=2)
+        self.client.force_authenticate(self.user)
+        response = self.client.get(f'/survey/{survey.slug}/')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        question = survey.question.order_by('pk').first()
+        self.assertEqual(data['question'][0]['pk'], question.pk)
+        self.assertEqual([answer['answer'] for answer in data['question'][0]['answers']],
+                         list(question.answers.order_by('pk').values_list('answer', flat=True)))
+
+    def test_detail_query_count_is_constant(self):
+        for title, questions in (('Small', 2), ('Large', 30)):
+            survey = self.create_survey(title=title, questions=questions)
+            self.client.force_authenticate(self.user)
+            with self.assertNumQueries(1):  # the survey with its compiled schema
+                self.client.get(f'/survey/{survey.slug}/')
+
+    def test_detail_is_served_from_cache(self):
+        survey = self.create_survey()
+        self.client.force_authenticate(self.user)
+        first = self.client.get(f'/survey/{survey.slug}/')
+        with self.assertNumQueries(0):
+            second = self.client.get(f'/survey/{survey.slug}/')
+        self.assertEqual(first.content, second.content)
+
+    def test_unpublish_invalidates_cache(self):
+        survey = self.create_survey()
+        self.client.force_authenticate(self.user)
+        self.client.get(f'/survey/{survey.slug}/')
+        survey.published = Survey.PublishedChoice.DRAFT
+        survey.save()
+        response = self.client.get(f'/survey/{survey.slug}/')
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(SURVEY_LOCAL_CACHE_TIMEOUT=5)
+    def test_locmem_cache_expires_in_seconds(self):
+        survey = self.create_survey()
+        self.client.force_authenticate(self.user)
+        self.client.get(f'/survey/{survey.slug}/')
+        # another worker invalidated its own locmem cache, this one notices once its entries expire
+        with mock.patch('django.core.cache.backends.locmem.time.time', return_value=time.time() + 6):
+            with self.assertNumQueries(1):
+                self.client.get(f'/survey/{survey.slug}/')
+
+
+class SurveyListTestCase(SurveyTestCase):
+    def test_list_is_cursor_paginated(self):
+        for number in range(3):
+            self.create_survey(title=f'Survey {number}', questions=0)
+        response = self.client.get('/survey/', {'page_size': 2})
+        self.assertEqual([survey['title'] for survey in response.data['results']], ['Survey 2', 'Survey 1'])
+        response = self.client.get(response.data['next'])
+        self.assertEqual([survey['title'] for survey in response.data['results']], ['Survey 0'])
+        self.assertIsNone(response.data['next'])
+
+    def test_cursor_pages_through_ties_without_offset(self):
+        for number in range(5):
+            self.create_survey(title=f'Survey {number}', questions=0)
+        Survey.objects.update(created_at=datetime(2024, 1, 1, tzinfo=dt_timezone.utc))
+        titles, url = [], '/survey/?page_size=2'
+        while url:
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(url)
+            self.assertFalse(any('OFFSET' in query['sql'] for query in context.captured_queries))
+            titles += [survey['title'] for survey in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(titles, [f'Survey {number}' for number in range(4, -1, -1)])
+        response = self.client.get(response.data['previous'])
+        self.assertEqual([survey['title'] for survey in response.data['results']], ['Survey 2', 'Survey 1'])
+
+    def test_cursor_bounds_the_index_scan(self):
+        Survey.objects.bulk_create([Survey(owner=self.owner, title=f'Survey {number}', slug=f'survey-{number}',
+                                           published=True) for number in range(5000)])
+        survey = Survey.objects.order_by('pk')[2500]
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {Survey._meta.db_table}')
+        for reverse in (False, True):
+            queryset = Survey.is_published.order_by('created_at', 'id') if reverse else Survey.is_published.all()
+            plan = keyset_filter(queryset, created_at=survey.created_at, pk=survey.pk, reverse=reverse)[:20].explain()
+            self.assertIn('Index Cond', plan)
+            self.assertRegex(plan, r'Index Cond: .*created_at [<>]=')
+
+    def test_list_includes_description_only_when_asked(self):
+        self.create_survey(questions=0)
+        self.assertNotIn('description', self.client.get('/survey/').data['results'][0])
+        response = self.client.get('/survey/', {'include': 'description'})
+        self.assertEqual(response.data['results'][0]['description'], 'Description')
+
+
+class SurveySearchTestCase(SurveyTestCase):
+    def search(self, text, **params):
+        response = self.client.get('/survey/search/', {'q': text, **params})
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def titles(self, response):
+        return [survey['title'] for survey in response.data['results']]
+
+    def test_search_ranks_title_matches_first(self):
+        self.create_survey(title='Coffee habits', questions=0)
+        described = self.create_survey(title='Morning routine', questions=0)
+        described.description = 'How much coffee do you drink?'
+        described.save()
+        self.create_survey(title='Coffee at work', published=False, questions=0)
+        self.assertEqual(self.titles(self.search('coffee')), ['Coffee habits', 'Morning routine'])
+
+    def test_search_finds_question_text_and_follows_admin_edits(self):
+        survey = self.create_survey(title='Breakfast', published=False)
+        survey.published = Survey.PublishedChoice.PUBLISHED
+        survey.schema = compile_schema(survey=survey)
+        survey.save()
+        self.assertEqual(self.titles(self.search('"question 1"')), ['Breakfast'])
+        question = Question.objects.filter(survey=survey).first()
+        question.question = 'Which pastries do you like?'
+        with self.captureOnCommitCallbacks(execute=True):
+            question.save()
+        self.assertEqual(self.titles(self.search('pastry')), ['Breakfast'])
+
+    def test_search_is_paginated(self):
+        for number in range(3):
+            self.create_survey(title=f'Survey {number}', questions=0)
+        response = self.search('survey', page_size=2)
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertEqual(len(self.client.get(response.data['next']).data['results']), 1)
+
+    def test_drafts_are_not_indexed(self):
+        survey = self.create_survey(title='Draft', published=False, questions=0)
+        with CaptureQueriesContext(connection) as context:
+            survey.save()
+        self.assertFalse(any('to_tsvector' in query['sql'] for query in context.captured_queries))
+
+    def test_search_requires_query(self):
+        self.assertEqual(self.client.get('/survey/search/').status_code, 400)
+
+
+class SurveyPublishTestCase(SurveyTestCase):
+    def publish(self, survey):
+        self.client.force_authenticate(self.owner)
+        return self.client.patch(f'/survey/published/{survey.slug}/', {'published': 1}, format='json')
+
+    def test_publish_valid_survey(self):
+        survey = self.create_survey(published=False)
+        self.assertEqual(self.publish(survey).status_code, 200)
+        survey.refresh_from_db()
+        self.assertTrue(survey.published)
+        self.assertEqual(len(survey.schema['detail']['question']), 3)
+
+    def test_publish_reports_every_invalid_question(self):
+        survey = self.create_survey(published=False, questions=3, answers=1)
+        Question.objects.filter(pk=survey.question.order_by('pk').first().pk).update(question_type='BINARY')
+        response = self.publish(survey)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(response.data['question']), 3)
+
+    def test_publish_without_questions(self):
+        survey = self.create_survey(published=False, questions=0)
+        self.assertIn('published', self.publish(survey).data)
+
+    def test_publish_query_count_is_flat(self):
+        counts = []
+        for title, questions in (('Small', 2), ('Large', 30)):
+            survey = self.create_survey(title=title, published=False, questions=questions)
+            with CaptureQueriesContext(connection) as context:
+                self.publish(survey)
+            counts.append(len(context))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_admin_edit_recompiles_schema_once(self):
+        survey = self.create_survey(published=False)
+        Survey.objects.filter(pk=survey.pk).update(published=Survey.PublishedChoice.PUBLISHED)
+        survey.refresh_from_db()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            for question in survey.question.all():
+                question.question = f'{question.question} edited'
+                question.save()
+        self.assertEqual(len(callbacks), 1)
+        survey.refresh_from_db()
+        questions = survey.schema['detail']['question']
+        self.assertTrue(all(question['question'].endswith('edited') for question in questions))
+
+    def test_admin_title_edit_recompiles_schema(self):
+        survey = self.create_survey(title='Old title', published=False)
+        Survey.objects.filter(pk=survey.pk).update(published=Survey.PublishedChoice.PUBLISHED,
+                                                   schema=compile_schema(survey=survey))
+        survey.refresh_from_db()
+        self.client.force_authenticate(self.user)
+        old_slug = survey.slug
+        self.assertEqual(json.loads(self.client.get(f'/survey/{old_slug}/').content)['title'], 'Old title')
+        survey.title = 'New title'
+        survey.description = 'New description'
+        with self.captureOnCommitCallbacks(execute=True):
+            survey.save()
+        detail = json.loads(self.client.get(f'/survey/{survey.slug}/').content)
+        self.assertEqual((detail['title'], detail['description']), ('New title', 'New description'))
+        self.assertEqual(self.client.get(f'/survey/{old_slug}/').status_code, 404)
+
+
+    def test_schema_compile_is_queued_once_until_it_runs(self):
+        survey = self.create_survey(published=False)
+        with self.captureOnCommitCallbacks() as callbacks:
+            schedule_schema_compile(survey_id=survey.pk)
+            schedule_schema_compile(survey_id=survey.pk)
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        with self.captureOnCommitCallbacks() as callbacks:
+            schedule_schema_compile(survey_id=survey.pk)
+        self.assertEqual(len(callbacks), 1)
+
+
+class AsyncSurveyViewsTestCase(SurveyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.survey = self.create_survey()
+        self.headers = {'authorization': f'Token {Token.objects.create(user=self.owner).key}'}
+
+    async def test_async_list(self):
+        response = await self.async_client.get('/survey/async/', {'page_size': 1})
+        self.assertEqual(response.json()['results'][0]['title'], 'Survey')
+        self.assertIsNone(response.json()['next'])
+
+    async def test_async_list_shares_the_cursors_of_the_list(self):
+        for number in range(3):
+            await sync_to_async(self.create_survey)(title=f'Survey {number}', questions=0)
+        sync_next = (await sync_to_async(self.client.get)('/survey/', {'page_size': 2})).data['next']
+        cursor = parse_qs(urlsplit(sync_next).query)['cursor'][0]
+        response = (await self.async_client.get('/survey/async/', {'page_size': 2, 'cursor': cursor})).json()
+        self.assertEqual([survey['title'] for survey in response['results']], ['Survey 0', 'Survey'])
+        self.assertIsNone(response['next'])
+        cursor = parse_qs(urlsplit(response['previous']).query)['cursor'][0]
+        response = await sync_to_async(self.client.get)('/survey/', {'page_size': 2, 'cursor': cursor})
+        self.assertEqual([survey['title'] for survey in response.data['results']], ['Survey 2', 'Survey 1'])
+        response = await self.async_client.get('/survey/async/', {'cursor': 'invalid'})
+        self.assertEqual(response.status_code, 404)
+
+    async def test_async_token_keyword_is_case_insensitive(self):
+        headers = {'authorization': self.headers['authorization'].replace('Token', 'token')}
+        response = await self.async_client.get(f'/survey/async/{self.survey.slug}/', headers=headers)
+        self.assertEqual(response.status_code, 200)
+
+    async def test_async_detail_requires_token(self):
+        response = await self.async_client.get(f'/survey/async/{self.survey.slug}/')
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.get(f'/survey/async/{self.survey.slug}/', headers=self.headers)
+        self.assertEqual(len(response.json()['question']), 3)
+
+    async def test_async_detail_is_served_from_cache(self):
+        first = await self.async_client.get(f'/survey/async/{self.survey.slug}/', headers=self.headers)
+        hits = survey_detail_cache.stats.hits
+        second = await self.async_client.get(f'/survey/async/{self.survey.slug}/', headers=self.headers)
+        self.assertEqual(survey_detail_cache.stats.hits, hits + 1)
+        self.assertEqual(first.content, second.content)
+
+    async def test_async_statistic(self):
+        response = await self.async_client.get(f'/survey/async/statistic/{self.survey.slug}/', headers=self.headers)
+        self.assertEqual(response.json()['passed_users'], 0)
+
+
+class ExportSurveyResponsesTestCase(SurveyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.survey = self.create_survey()
+        self.client.force_authenticate(self.user)
+        self.client.post(f'/survey/submit/{self.survey.slug}/', self.submit_payload(self.survey), format='json')
+
+    def test_export_is_owner_only(self):
+        self.assertEqual(self.client.get(f'/survey/export/{self.survey.slug}/').status_code, 403)
+
+    def test_export_csv(self):
+        self.client.force_authenticate(self.owner)
+        response = self.client.get(f'/survey/export/{self.survey.slug}/')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'submission_id,user,submitted_at,question_id,question,answer_id,answer')
+        self.assertEqual(len(lines), 4)
+
+    def test_export_ndjson(self):
+        self.client.force_authenticate(self.owner)
+        response = self.client.get(f'/survey/export/{self.survey.slug}/', {'output': 'ndjson'})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual({row['user'] for row in rows}, {'user'})
+
+    def test_export_command(self):
+        out = StringIO()
+        call_command('export_survey_responses', self.survey.slug, stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 4)
+
+
+class SurveyStatisticQueryTestCase(SurveyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.survey = self.create_survey(questions=2, answers=2)
+        self.first, self.second = self.survey.question.order_by('pk')
+        self.first_answers = list(self.first.answers.order_by('pk'))
+        self.second_answers = list(self.second.answers.order_by('pk'))
+        # both chose the first answer of the first question and differ on the second question
+        for user, second in ((self.user, self.second_answers[0]), (self.owner, self.second_answers[1])):
+            Submission.objects.record(survey=self.survey, user=user, answers=[
+                {'question_id': self.first.pk, 'answers': [self.first_answers[0].pk]},
+                {'question_id': self.second.pk, 'answers': [second.pk]},
+            ])
+        self.client.force_authenticate(self.owner)
+
+    def query(self, **params):
+        return self.client.get(f'/survey/statistic/{self.survey.slug}/query/', params)
+
+    def test_filtered_distribution(self):
+        response = self.query(question=self.second.pk, answer=self.first_answers[0].pk)
+        self.assertEqual(response.data['respondents'], 2)
+        response = self.query(question=self.first.pk, answer=self.second_answers[1].pk)
+        self.assertEqual(response.data['respondents'], 1)
+        self.assertEqual(response.data['distributions'][0]['answers'],
+                         [{'answer': self.first_answers[0].pk, 'count': 1},
+                          {'answer': self.first_answers[1].pk, 'count': 0}])
+
+    def test_crosstab(self):
+        response = self.query(crosstab=f'{self.first.pk},{self.second.pk}')
+        cells = {(cell['row'], cell['column']): cell['count'] for cell in response.data['crosstabs'][0]['cells']}
+        self.assertEqual(cells[(self.first_answers[0].pk, self.second_answers[0].pk)], 1)
+        self.assertEqual(cells[(self.first_answers[0].pk, self.second_answers[1].pk)], 1)
+        self.assertEqual(cells[(self.first_answers[1].pk, self.second_answers[0].pk)], 0)
+
+    def test_date_range(self):
+        response = self.query(since='2000-01-01T00:00', until='2000-02-01T00:00')
+        self.assertEqual(response.data['respondents'], 0)
+
+    def test_foreign_question_is_rejected(self):
+        other = self.create_survey(title='Other', questions=1)
+        self.assertEqual(self.query(question=other.question.get().pk).status_code, 400)
+
+
+class ResponseRollupTestCase(SurveyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.survey = self.create_survey(questions=1, answers=2)
+        self.answers = list(Answer.objects.filter(question__survey=self.survey).order_by('pk'))
+        self.client.force_authenticate(self.owner)
+
+    def submit(self, user, answer, submitted_at):
+        submission = Submission.objects.record(survey=self.survey, user=user, answers=[
+            {'question_id': answer.question_id, 'answers': [answer.pk]}])
+        Submission.objects.filter(pk=submission.pk).update(submitted_at=submitted_at)
+
+    def roll_up(self):
+        call_command('rollup_responses', delay=0, stdout=StringIO())
+
+    def test_rollup_is_incremental(self):
+        self.submit(self.user, self.answers[0], datetime(2024, 1, 1, 10, 15, tzinfo=dt_timezone.utc))
+        self.roll_up()
+        self.submit(self.owner, self.answers[1], datetime(2024, 1, 1, 10, 45, tzinfo=dt_timezone.utc))
+        self.roll_up()
+        self.roll_up()  # nothing new
+        hour = ResponseRollup.objects.filter(survey=self.survey, period='hour')
+        self.assertEqual(hour.get(answer=None).count, 2)
+        self.assertEqual(hour.get(answer=self.answers[0]).count, 1)
+        self.assertEqual(RollupMark.objects.get().submission_id, Submission.objects.latest('pk').pk)
+
+    def test_rollup_stops_before_recently_stored_submission(self):
+        other = get_user_model().objects.create_user(username='other')
+        for user, answer in ((self.user, self.answers[0]), (self.owner, self.answers[1]), (other, self.answers[0])):
+            self.submit(user, answer, datetime(2024, 1, 1, 10, 15, tzinfo=dt_timezone.utc))
+        first, second, third = Submission.objects.order_by('pk')
+        Submission.objects.exclude(pk=second.pk).update(stored_at=datetime(2024, 1, 1, tzinfo=dt_timezone.utc))
+        # the second one may belong to a transaction which is still running
+        self.assertEqual(roll_up(delay=60), 1)
+        self.assertEqual(RollupMark.objects.get().submission_id, first.pk)
+        Submission.objects.filter(pk=second.pk).update(stored_at=datetime(2024, 1, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual(roll_up(delay=60), 2)
+        self.assertEqual(ResponseRollup.objects.get(period='day', answer=None).count, 3)
+
+    def test_timeseries_is_one_range_query(self):
+        self.submit(self.user, self.answers[0], datetime(2024, 1, 1, 10, 15, tzinfo=dt_timezone.utc))
+        self.submit(self.owner, self.answers[1], datetime(2024, 1, 2, 9, 0, tzinfo=dt_timezone.utc))
+        self.roll_up()
+        with self.assertNumQueries(2):  # the survey and the rollups
+            response = self.client.get(f'/survey/statistic/{self.survey.slug}/timeseries/',
+                                       {'period': 'day', 'since': '2024-01-02T00:00'})
+        self.assertEqual(len(response.data['buckets']), 1)
+        self.assertEqual(response.data['buckets'][0]['responses'], 1)
+        self.assertEqual(response.data['buckets'][0]['answers'], {self.answers[1].pk: 1})
+
+
+class SurveyDeleteTestCase(SurveyTestCase):
+    def delete(self, survey):
+        self.client.force_authenticate(self.owner)
+        return self.client.delete(f'/survey/delete/{survey.slug}/')
+
+    def test_delete_hides_survey_and_frees_title(self):
+        survey = self.create_survey()
+        self.assertEqual(self.delete(survey).status_code, 204)
+        self.assertFalse(Survey.objects.exists())
+        self.assertEqual(Question.objects.filter(survey_id=survey.pk).count(), 3)  # left for the purge
+        self.assertEqual(SurveyPurge.objects.get().survey_id, survey.pk)
+        self.assertEqual(self.client.get(f'/survey/{survey.slug}/').status_code, 404)
+        self.assertEqual(self.client.get('/survey/search/', {'q': 'survey'}).data['count'], 0)
+        response = self.client.post('/survey/new/', {'title': survey.title}, format='json')
+        self.assertEqual(response.status_code, 201)
+        response = self.client.post('/survey/new/', {'title': survey.title}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_concurrent_delete_records_one_purge(self):
+        survey = self.create_survey()
+        self.assertTrue(mark_deleted(survey=survey))
+        self.assertFalse(mark_deleted(survey=survey))  # the second request loaded the survey before the first
+        self.assertEqual(SurveyPurge.objects.filter(survey_id=survey.pk).count(), 1)
+
+    def test_purge_deletes_rows_in_batches(self):
+        survey = self.create_survey(questions=3, answers=2)
+        self.client.force_authenticate(self.user)
+        self.client.post(f'/survey/submit/{survey.slug}/', self.submit_payload(survey), format='json')
+        PendingSubmission.objects.create(survey=survey, user=self.owner, answers=[])
+        call_command('rollup_responses', delay=0, stdout=StringIO())
+        kept = self.create_survey(title='Kept')
+        self.delete(survey)
+        with CaptureQueriesContext(connection) as context:
+            call_command('purge_deleted_surveys', batch_size=2, pause=0, stdout=StringIO())
+        self.assertTrue(any('LIMIT 2' in query['sql'] for query in context.captured_queries))
+        self.assertFalse(Survey.all_objects.filter(pk=survey.pk).exists())
+        for model in (Question, Submission, PendingSubmission, ResponseRollup):
+            self.assertFalse(model.objects.filter(survey_id=survey.pk).exists())
+        self.assertFalse(Answer.objects.filter(question__survey_id=survey.pk).exists())
+        self.assertFalse(Selection.objects.filter(question__survey_id=survey.pk).exists())
+        purge = SurveyPurge.objects.get()
+        # pending, submission, 3 selections, (1 + 3) * 2 periods rollups, 6 answers, 3 questions and the survey
+        self.assertEqual(purge.deleted_rows, 1 + 1 + 3 + 8 + 6 + 3 + 1)
+        self.assertIsNotNone(purge.finished_at)
+        self.assertEqual(Question.objects.filter(survey=kept).count(), 3)
+
+
+@override_settings(INSTRUMENTATION_SAMPLE_RATE=1.0)
+class InstrumentationTestCase(SurveyTestCase):
+    def setUp(self):
+        super().setUp()
+        endpoint_metrics.clear()
+
+    def test_server_timing_counts_queries(self):
+        survey = self.create_survey()
+        self.client.force_authenticate(self.owner)
+        response = self.client.get(f'/survey/statistic/{survey.slug}/')
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('serializer;dur=', response['Server-Timing'])
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(f'/survey/statistic/{survey.slug}/')
+        self.assertIn(f'desc="{len(context)} queries"', response['Server-Timing'])
+
+    def test_report_is_admin_only(self):
+        survey = self.create_survey()
+        self.client.force_authenticate(self.user)
+        self.client.get(f'/survey/{survey.slug}/')
+        self.assertEqual(self.client.get('/survey/timings/').status_code, 403)
+        self.user.is_staff = True
+        self.user.save()
+        report = self.client.get('/survey/timings/').data
+        self.assertEqual(report['endpoints']['survey.views.SurveyDetailAPIView']['requests'], 1)
+        self.assertEqual(set(report['pools']), {alias for alias in connections if connections[alias].pool})
+        self.assertEqual(self.client.delete('/survey/timings/').status_code, 204)
+
+    @override_settings(INSTRUMENTATION_SAMPLE_RATE=0.0)
+    def test_unsampled_requests_are_not_measured(self):
+        response = self.client.get('/survey/')
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertEqual(endpoint_metrics.report(), {})
+
+    def test_histogram_percentiles(self):
+        histogram = Histogram()
+        for value in range(1, 101):
+            histogram.add(value)
+        self.assertAlmostEqual(histogram.percentile(50), 50, delta=5)
+        self.assertAlmostEqual(histogram.percentile(99), 99, delta=10)
+        self.assertEqual(histogram.percentile(100), 100)
+
+
+class SurveyAdminTestCase(SurveyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = get_user_model().objects.create_superuser(username='admin', password='password')
+        self.client.force_login(self.admin)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def test_change_lists_are_constant_query(self):
+        urls = ('/admin/survey/survey/', '/admin/survey/question/', '/admin/survey/answer/')
+        self.create_survey(title='First', questions=1, answers=1)
+        counts = [self.count_queries(url) for url in urls]
+        for number in range(5):
+            self.create_survey(title=f'Survey {number}', questions=4, answers=3)
+        self.assertEqual([self.count_queries(url) for url in urls], counts)
+
+    def test_change_list_shows_counts(self):
+        self.create_survey(questions=4, answers=3)
+        response = self.client.get('/admin/survey/survey/')
+        self.assertEqual(response.context['cl'].result_list[0].question_count, 4)
+        response = self.client.get('/admin/survey/question/')
+        self.assertEqual({question.answer_count for question in response.context['cl'].result_list}, {3})
+
+    def test_inlines_are_capped(self):
+        survey = self.create_survey(questions=60, answers=0)
+        response = self.client.get(f'/admin/survey/survey/{survey.pk}/change/')
+        self.assertEqual(response.context['inline_admin_formsets'][0].formset.initial_form_count(), 50)
+
+    def test_delete_marks_survey_deleted(self):
+        survey = self.create_survey()
+        response = self.client.post(f'/admin/survey/survey/{survey.pk}/delete/', {'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+        self.assertIsNotNone(Survey.all_objects.get(pk=survey.pk).deleted_at)
+        self.assertTrue(SurveyPurge.objects.filter(survey_id=survey.pk).exists())
+
+    def test_delete_purges_questions_and_answers(self):
+        survey = self.create_survey(questions=2, answers=2, published=False)  # queues no schema compile
+        Survey.objects.filter(pk=survey.pk).update(published=Survey.PublishedChoice.PUBLISHED,
+                                                   schema=compile_schema(survey=survey))
+        survey.refresh_from_db()
+        Submission.objects.record(survey=survey, user=self.user, answers=self.submit_payload(survey)['answers'])
+        question, other = survey.question.order_by('pk')
+        answer = other.answers.order_by('pk').first()
+        version = survey_detail_cache.get_version(slug=survey.slug)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/admin/survey/question/{question.pk}/delete/', {'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+        self.assertNotEqual(survey_detail_cache.get_version(slug=survey.slug), version)
+        response = self.client.post('/admin/survey/answer/', {'action': 'delete_selected', 'post': 'yes',
+                                                               '_selected_action': [answer.pk]})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(list(Question.objects.filter(survey=survey)), [other])
+        self.assertEqual(Answer.objects.filter(question__survey=survey).count(), 1)
+        self.assertEqual(Selection.objects.filter(submission__survey=survey).count(), 0)
+        schema = Survey.objects.get(pk=survey.pk).schema
+        self.assertEqual([item['pk'] for item in schema['detail']['question']], [other.pk])
+
+    def test_answers_filter_by_survey_state(self):
+        self.create_survey(questions=1, answers=2)
+        response = self.client.get('/admin/survey/answer/', {'question__survey__published__exact': '1'})
+        self.assertEqual(response.context['cl'].result_count, 2)
+
+
+class BenchmarkCommandsTestCase(SurveyTestCase):
+    def test_generate_survey_data(self):
+        call_command('generate_survey_data', users=5, surveys=2, questions=2, answers=3, submissions=4,
+                     allow_database=True, stdout=StringIO())
+        surveys = Survey.objects.filter(title__startswith='Synthetic')
+        self.assertEqual([survey.passed_count for survey in surveys], [4, 4])
+        self.assertTrue(all(survey.schema for survey in surveys))
+        self.assertEqual(Selection.objects.filter(submission__survey__in=surveys).count(), 2 * 4 * 2)
+
+    def test_benchmark_refuses_database_without_debug(self):
+        with self.assertRaisesMessage(CommandError, '--allow-database'):
+            call_command('benchmark_endpoints', users=1, surveys=1, repeat=1, stdout=StringIO())
+        self.assertFalse(Survey.objects.exists())
+
+    def test_rolled_back_leaves_no_cache_entries(self):
+        with rolled_back():
+            survey = self.create_survey()
+            passed_survey_cache.add(survey_id=survey.pk, user_id=self.user.pk)
+            cache.set('benchmark-entry', True)
+            survey_detail_cache.invalidate(slug=survey.slug)
+        self.assertFalse(passed_survey_cache.contains(survey_id=survey.pk, user_id=self.user.pk))
+        self.assertIsNone(cache.get('benchmark-entry'))
+
+    def test_benchmark_fails_on_query_regression(self):
+        options = {'users': 5, 'surveys': 2, 'questions': 2, 'answers': 2, 'submissions': 3, 'repeat': 2,
+                   'allow_database': True, 'stdout': StringIO()}
+        with tempfile.TemporaryDirectory() as directory:
+            baseline = os.path.join(directory, 'baseline.json')
+            call_command('benchmark_endpoints', baseline=baseline, save_baseline=True, **options)
+            with open(baseline) as file:
+                saved = json.load(file)
+            call_command('benchmark_endpoints', baseline=baseline, tolerance=1000, **options)
+            saved['submit']['queries'] -= 1
+            with open(baseline, 'w') as file:
+                json.dump(saved, file)
+            with self.assertRaisesMessage(CommandError, 'submit'):
+                call_command('benchmark_endpoints', baseline=baseline, tolerance=1000, **options)
+
+
+class SurveyTreeTestCase(SurveyTestCase):
+    def tree(self, title='Tree', questions=3, answers=3):
+        return {'title': title, 'description': 'Description',
+                'question': [{'question': f'Question {number}', 'question_type': 'DEFAULT',
+                              'answers': [{'answer': f'Answer {choice}'} for choice in range(answers)]}
+                             for number in range(questions)]}
+
+    def texts(self, tree):
+        return [(question['question'], [answer['answer'] for answer in question['answers']])
+                for question in tree['question']]
+
+    def test_create_query_count_is_flat(self):
+        self.client.force_authenticate(self.owner)
+        counts = []
+        for title, questions in (('Small', 2), ('Large', 50)):
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.post('/survey/bulk/', self.tree(title=title, questions=questions),
+                                            format='json')
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(len(response.data['question']), questions)
+            counts.append(len(context))
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(Answer.objects.filter(question__survey__title='Large').count(), 150)
+
+    def test_export_round_trip(self):
+        self.client.force_authenticate(self.owner)
+        slug = self.client.post('/survey/bulk/', self.tree(), format='json').data['slug']
+        exported = self.client.get(f'/survey/bulk/{slug}/').data
+        exported['title'] = 'Copy'
+        copy = self.client.post('/survey/bulk/', exported, format='json').data
+        self.assertEqual(self.texts(copy), self.texts(exported))
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get(f'/survey/bulk/{slug}/').status_code, 403)
+
+    def test_invalid_tree_writes_nothing(self):
+        self.client.force_authenticate(self.owner)
+        tree = self.tree()
+        tree['question'][2]['question_type'] = 'UNKNOWN'
+        self.assertEqual(self.client.post('/survey/bulk/', tree, format='json').status_code, 400)
+        self.assertFalse(Survey.objects.filter(title='Tree').exists())
+
+    def test_import_command_reads_yaml(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.yaml') as file:
+            yaml.safe_dump([self.tree(title='First'), self.tree(title='Second')], file)
+            file.flush()
+            call_command('import_surveys', file.name, owner='owner', stdout=StringIO())
+        self.assertEqual(Question.objects.filter(survey__owner=self.owner, survey__published=False).count(), 6)
+
+
+class FastJSONTestCase(SurveyTestCase):
+    def test_read_serializers_match_model_serializers(self):
+        survey = Survey.objects.prefetch_related(QUESTION_TREE).get(pk=self.create_survey().pk)
+        self.assertEqual(serializers.SurveyStatisticReadSerializer(survey).data,
+                         SurveyStatisticSerializer(survey).data)
+        for context in ({}, {'include_description': True}):
+            self.assertEqual(serializers.SurveyListReadSerializer([survey], many=True, context=context).data,
+                             SurveyListSerializer([survey], many=True, context=context).data)
+
+    def test_renderer_matches_drf_and_falls_back(self):
+        data = {'text': 'ünïcode \u2028', 'number': Decimal('1.5'), 'keys': {1: 2}, 'when': datetime(2024, 1, 1),
+                'aware': datetime(2024, 1, 1, 12, 30, 15, 123456, tzinfo=dt_timezone.utc)}
+        expected = JSONRenderer().render(data)
+        self.assertIn(b'"2024-01-01T12:30:15.123456Z"', expected)
+        self.assertEqual(FastJSONRenderer().render(data), expected)
+        with mock.patch('django_project.renderers.orjson', None):
+            self.assertEqual(FastJSONRenderer().render(data), expected)
+            self.assertEqual(FastJSONParser().parse(BytesIO(b'{"a": [1]}')), {'a': [1]})
+        self.assertEqual(FastJSONParser().parse(BytesIO(b'{"a": [1]}')), {'a': [1]})
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(BytesIO(b'{"a": '))
+
+
+class ConditionalGetTestCase(SurveyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.survey = self.create_survey()
+        self.client.force_authenticate(self.owner)
+
+    def test_detail_not_modified_without_queries(self):
+        url = f'/survey/{self.survey.slug}/'
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.survey.description = 'Changed'
+        self.survey.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_statistics_changes_with_submissions(self):
+        url = f'/survey/statistic/{self.survey.slug}/'
+        response = self.client.get(url)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        with self.assertNumQueries(1):  # the counters
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+        Submission.objects.record(survey=self.survey, user=self.user,
+                                  answers=self.submit_payload(self.survey)['answers'])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_missing_survey_is_not_found(self):
+        self.assertEqual(self.client.get('/survey/statistic/missing/', HTTP_IF_NONE_MATCH='"1"').status_code, 404)
+
+    def test_validators_outlive_the_local_cache(self):
+        urls = (f'/survey/{self.survey.slug}/', f'/survey/statistic/{self.survey.slug}/')
+        etags = [self.client.get(url)['ETag'] for url in urls]
+        with mock.patch('django.core.cache.backends.locmem.time.time', return_value=time.time() + 6):
+            for url, etag in zip(urls, etags):
+                self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        Question.objects.create(survey=self.survey, question='Added')
+        for url, etag in zip(urls, etags):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_detail_of_hidden_survey_is_not_found(self):
+        etag = f'"{survey_detail_cache.get_version(slug="missing")}"'
+        self.assertEqual(self.client.get('/survey/missing/', HTTP_IF_NONE_MATCH=etag).status_code, 404)
+        url = f'/survey/{self.survey.slug}/'
+        self.client.get(url)
+        mark_deleted(survey=self.survey)
+        etag = f'"{survey_detail_cache.get_version(slug=self.survey.slug)}"'
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 404)
+
+
+class ReplicaRouterTestCase(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.router = ReplicaRouter()
+        self.user = get_user_model()(pk=1)
+        patcher = mock.patch.dict(connections.settings, {'replica': connections.settings['default']})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def request(self, method='get'):
+        request = getattr(RequestFactory(), method)('/survey/')
+        request.user = self.user
+        return request
+
+    def test_reads_go_to_the_replica(self):
+        self.assertEqual(self.router.db_for_read(Survey), 'replica')
+        self.assertIsNone(self.router.db_for_read(Token))
+        self.assertEqual(self.router.db_for_write(Survey), 'default')
+        with use_primary():
+            self.assertEqual(self.router.db_for_read(Survey), 'default')
+
+    def test_writes_pin_the_user_to_the_primary(self):
+        middleware = ReplicaPinningMiddleware(lambda request: HttpResponse(self.router.db_for_read(Survey)))
+        self.assertEqual(middleware(self.request()).content, b'replica')
+        self.assertEqual(middleware(self.request('post')).content, b'default')
+        self.assertEqual(middleware(self.request()).content, b'default')
+        self.user = get_user_model()(pk=2)
+        self.assertEqual(middleware(self.request()).content, b'replica')
+
+
+@skipUnless('replica' in connections, 'Set DATABASE_REPLICA_URL to run it with two databases.')
+class ReplicaTestCase(TransactionTestCase):
+    databases = '__all__'
+
+    def test_list_reads_from_the_replica_until_the_user_writes(self):
+        cache.clear()
+        owner = get_user_model().objects.create_user(username='owner', password='password')
+        client = APIClient()
+        client.force_authenticate(owner)
+        with CaptureQueriesContext(connections['replica']) as replica:
+            client.get('/survey/my-survey/')
+        self.assertEqual(len(replica), 1)
+        client.post('/survey/new/', {'title': 'Survey', 'description': 'Description'}, format='json')
+        with CaptureQueriesContext(connections['replica']) as replica:
+            response = client.get('/survey/my-survey/')
+        self.assertEqual(len(replica), 0)
+        self.assertEqual(len(response.data['results']), 1)
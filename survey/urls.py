@@ -1,23 +1,36 @@
 from django.urls import path
 
+import survey.async_views as async_views
 import survey.views as views
 
 urlpatterns = [
     # survey
     path('', views.SurveyListAPIView.as_view()),
     path('my-survey/', views.ShowMySurveyAPIView.as_view()),
+    path('search/', views.SurveySearchAPIView.as_view()),
     path('new/', views.SurveyCreateAPIView.as_view()),
+    path('bulk/', views.SurveyTreeCreateAPIView.as_view()),
+    path('bulk/<slug:slug>/', views.SurveyTreeExportAPIView.as_view()),
     path('statistic/<slug:slug>/', views.ShowStatisticOfSurvey.as_view(), name='survey_statistic'),
+    path('statistic/<slug:slug>/query/', views.SurveyStatisticQueryAPIView.as_view()),
+    path('statistic/<slug:slug>/timeseries/', views.SurveyTimeSeriesAPIView.as_view()),
     path('edit/<slug:slug>/', views.SurveyUpdateAPIView.as_view()),
     path('published/<slug:slug>/', views.PublishedSurvey.as_view()),
     path('submit/<slug:slug>/', views.SurveySubmitAPIView.as_view()),
     path('delete/<slug:slug>/', views.SurveyDeleteAPIView.as_view()),
+    path('export/<slug:slug>/', views.ExportSurveyResponsesAPIView.as_view()),
+    path('cache-stats/', views.CacheStatsAPIView.as_view()),
+    path('timings/', views.TimingReportAPIView.as_view()),
     # questions
     path('questions/create/<slug:survey_slug>/', views.QuestionCreateAPIView.as_view()),
     path('questions/delete/<int:pk>/', views.QuestionDeleteAPIView.as_view()),
     # answer
     path('answer-to-qestion/<int:question_id>/', views.AddAnswerToQuestionAPIView.as_view()),
     path('answer/delete/<int:pk>/', views.DeleteAnswerAPIView.as_view()),
+    # async read endpoints
+    path('async/', async_views.AsyncSurveyListView.as_view(), name='async_survey_list'),
+    path('async/statistic/<slug:slug>/', async_views.AsyncShowStatisticOfSurveyView.as_view()),
+    path('async/<slug:slug>/', async_views.AsyncSurveyDetailView.as_view()),
     # greedy slug
     path('<slug:slug>/', views.SurveyDetailAPIView.as_view()),
 ]
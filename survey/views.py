@@ -1,27 +1,98 @@
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 
 from rest_framework import generics, mixins
 from rest_framework.mixins import UpdateModelMixin
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
-from rest_framework.status import HTTP_403_FORBIDDEN
+from rest_framework.status import (HTTP_200_OK, HTTP_202_ACCEPTED, HTTP_204_NO_CONTENT, HTTP_400_BAD_REQUEST,
+                                   HTTP_403_FORBIDDEN)
 
-from .models import Survey, Question, Answer
+from django_project.instrumentation import endpoint_metrics, pool_stats
+from django_project.renderers import dumps
+from django_project.routers import use_primary
+
+from .models import Survey, Question, Answer, Submission, PendingSubmission
 
 import survey.serializers as serializers
 
-from .permissions import IsOwnerOfSurvey, IsSurveyDraft
+from .cache import survey_detail_cache, survey_schema_cache, passed_survey_cache
+from .exports import EXPORT_FORMATS, response_rows
+from .pagination import SurveyCursorPagination, SurveySearchPagination
+from .purge import mark_deleted
+from .schema import load_schema
+from .search import search_surveys
+from .statistics import response_timeseries, survey_statistics
+
+from .permissions import IsOwnerOfSurvey, IsOwnerOfSurveyData, IsSurveyDraft
+
+
+# survey, its questions and their answers in three queries
+QUESTION_TREE = Prefetch('question', queryset=Question.objects.order_by('pk').prefetch_related(
+    Prefetch('answers', queryset=Answer.objects.order_by('pk'))))
+
+
+class ConditionalGetMixin:
+    """
+    Answers If-None-Match and If-Modified-Since with 304 from the cheap validators of get_validators(),
+    before the object is loaded or serialized, and sends them with every full response.
+    """
+
+    def get_validators(self):
+        """
+        (etag, last modified timestamp) of the requested object, or None to skip the conditional check.
+        It must not validate objects the request can't see, which get() would answer with 403 or 404.
+        """
+        return None
+
+    def get(self, request, *args, **kwargs):
+        validators = self.get_validators()
+        if validators is None:
+            return super().get(request, *args, **kwargs)
+        etag, last_modified = validators
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+        return response
 
 
 # survey
 
-class ShowMySurveyAPIView(generics.ListAPIView):
+class SurveyListMixin:
+    """
+    Cursor paginated list of surveys, which loads the description only for ?include=description.
+    """
+    serializer_class = serializers.SurveyListReadSerializer
+    pagination_class = SurveyCursorPagination
+    list_fields = ('id', 'title', 'slug', 'created_at')
+
+    def include_description(self):
+        return 'description' in self.request.query_params.getlist('include')
+
+    def get_queryset(self):
+        fields = self.list_fields + ('description',) if self.include_description() else self.list_fields
+        return super().get_queryset().only(*fields)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['include_description'] = self.include_description()
+        return context
+
+
+class ShowMySurveyAPIView(SurveyListMixin, generics.ListAPIView):
     queryset = Survey.objects.all()
-    serializer_class = serializers.SurveyListSerializer
     permission_classes = (IsAuthenticated,)
 
     def get_queryset(self):
-        return self.request.user.surveys
+        return super().get_queryset().filter(owner=self.request.user)
 
 
 class SurveyCreateAPIView(generics.CreateAPIView):
@@ -29,12 +100,41 @@ class SurveyCreateAPIView(generics.CreateAPIView):
     permission_classes = (IsAuthenticated,)
 
 
+class SurveyTreeCreateAPIView(generics.CreateAPIView):
+    """
+    Creates a draft survey with all its questions and answers in one request, see SurveyTreeSerializer.
+    """
+    serializer_class = serializers.SurveyTreeSerializer
+    permission_classes = (IsAuthenticated,)
+
+    def perform_create(self, serializer):
+        survey = serializer.save(owner=self.request.user)
+        serializer.instance = Survey.objects.prefetch_related(QUESTION_TREE).get(pk=survey.pk)
+
+
+class SurveyTreeExportAPIView(generics.RetrieveAPIView):
+    """
+    The survey with all its questions and answers, in the format SurveyTreeCreateAPIView accepts.
+    """
+    queryset = Survey.objects.prefetch_related(QUESTION_TREE)
+    serializer_class = serializers.SurveyTreeSerializer
+    permission_classes = (IsAuthenticated, IsOwnerOfSurveyData)
+    lookup_field = 'slug'
+    lookup_url_kwarg = 'slug'
+
+
 class SurveyDeleteAPIView(generics.DestroyAPIView):
+    """
+    Hides the survey at once, its rows are deleted in the background by purge_deleted_surveys.
+    """
     queryset = Survey.objects.all()
     permission_classes = (IsAuthenticated, IsOwnerOfSurvey)
     lookup_field = 'slug'
     lookup_url_kwarg = 'slug'
 
+    def perform_destroy(self, instance):
+        mark_deleted(survey=instance)
+
 
 class SurveyUpdateAPIView(generics.GenericAPIView, UpdateModelMixin):
     queryset = Survey.objects.all()
@@ -58,37 +158,105 @@ class PublishedSurvey(mixins.UpdateModelMixin, generics.GenericAPIView):
         return self.partial_update(request, *args, **kwargs)
 
 
-class SurveyDetailAPIView(generics.RetrieveAPIView):
+class SurveyDetailAPIView(ConditionalGetMixin, generics.RetrieveAPIView):
     queryset = Survey.is_published.all()
-    serializer_class = serializers.ShowSurveyDetailSerializer
     permission_classes = (IsAuthenticated,)
     lookup_field = 'slug'
     lookup_url_kwarg = 'slug'
 
+    def get_validators(self):
+        """
+        When the survey last changed, cached with its detail. The detail is cached only for a published
+        survey, so a hit needs no query and a miss loads the survey, which raises 404 for the slugs of
+        unpublished, deleted or unknown surveys before any 304.
+        """
+        slug = self.kwargs.get('slug')
+        version = survey_detail_cache.get_version(slug=slug)
+        entry = survey_detail_cache.get(slug=slug, version=version)
+        if entry is None:
+            with use_primary():  # a lagging replica would cache an outdated survey under the new version
+                survey = self.get_object()
+                entry = (survey.changed_at, dumps(load_schema(survey=survey).detail))
+            survey_detail_cache.set(slug=slug, version=version, content=entry)
+        changed_at, self.content = entry
+        return quote_etag(str(int(changed_at.timestamp() * 10 ** 6))), int(changed_at.timestamp())
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        A published survey can't be changed, so its rendered JSON is served from the cache until
+        the survey is unpublished, deleted or edited through the admin. On a miss the detail is rendered
+        from the schema compiled at publish time, see get_validators().
+        """
+        return HttpResponse(self.content, content_type='application/json')
+
+
+class CacheStatsAPIView(generics.GenericAPIView):
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request, *args, **kwargs):
+        return Response(data={
+            'survey_detail': survey_detail_cache.stats.as_dict(),
+            'survey_schema': survey_schema_cache.stats.as_dict(),
+            'passed_survey': passed_survey_cache.stats.as_dict(),
+        })
+
+
+class TimingReportAPIView(generics.GenericAPIView):
+    """
+    Percentiles of the timings of the sampled requests of this process per URL name with the usage of
+    its connection pools, DELETE starts the timings over.
+    """
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request, *args, **kwargs):
+        return Response(data={'endpoints': endpoint_metrics.report(), 'pools': pool_stats()})
+
+    def delete(self, request, *args, **kwargs):
+        endpoint_metrics.clear()
+        return Response(status=HTTP_204_NO_CONTENT)
+
+
+class SurveyListAPIView(SurveyListMixin, generics.ListAPIView):
+    queryset = Survey.is_published.all()
+
+
+class SurveySearchAPIView(SurveyListMixin, generics.ListAPIView):
+    """
+    Published surveys matching ?q= in their title, description or questions, best matches first.
+    """
+    queryset = Survey.is_published.all()
+    pagination_class = SurveySearchPagination
 
-class SurveyListAPIView(generics.ListAPIView):
-    queryset = Survey.is_published
-    serializer_class = serializers.SurveyListSerializer
+    def get_queryset(self):
+        serializer = serializers.SearchQuerySerializer(data=self.request.query_params)
+        serializer.is_valid(raise_exception=True)
+        return search_surveys(queryset=super().get_queryset(), text=serializer.validated_data['q'])
 
 
 class SurveySubmitAPIView(generics.GenericAPIView):
-    serializer_class = serializers.QuestionSubmitSerializer
+    serializer_class = serializers.SurveySubmitSerializer
     permission_classes = (IsAuthenticated,)
 
     def is_user_pass_survey(self, user, survey):
-        return user in survey.passed_users()
+        if passed_survey_cache.contains(survey_id=survey.pk, user_id=user.pk):
+            return True
+        if survey.is_passed_by(user=user):
+            passed_survey_cache.add(survey_id=survey.pk, user_id=user.pk)
+            return True
+        return False
 
     def get_survey(self):
         return get_object_or_404(Survey.is_published, slug=self.kwargs.get('slug', None))
 
-    def _add_user_to_answers(self, serializer, user):
-        answers = [answer for data in serializer.data for answer in data.get('answers')]
-        answers = Answer.objects.filter(pk__in=answers)
-        for answer in answers:
-            answer.add_user(user)
+    def is_async_ingest(self):
+        return getattr(settings, 'SURVEY_ASYNC_INGEST', False)
 
-    def _add_user_to_survey(self, survey, user):
-        survey.add_user_pass(user=user)
+    def _save_submission(self, serializer, survey, user):
+        answers = serializer.validated_data.get('answers')
+        if self.is_async_ingest():  # stored later by the drain_submissions command
+            PendingSubmission.objects.create(survey=survey, user=user, answers=answers)
+        else:
+            Submission.objects.record(survey=survey, user=user, answers=answers)
 
     def post(self, request, *args, **kwargs):
         """
@@ -105,24 +273,101 @@ class SurveySubmitAPIView(generics.GenericAPIView):
         user = self.request.user
         survey = self.get_survey()
         if not self.is_user_pass_survey(survey=survey, user=user):
-            serializer = serializers.QuestionSubmitSerializer(data=request.data.get('answers'),
-                                                              context={'survey': survey},
-                                                              many=True)
+            serializer = self.get_serializer(data=request.data, context={'survey': survey})
             serializer.is_valid(raise_exception=True)
-            self._add_user_to_answers(serializer=serializer, user=user)
-            self._add_user_to_survey(survey=survey, user=user)
-            return Response(data=serializer.data)
+            try:
+                with transaction.atomic():
+                    self._save_submission(serializer=serializer, survey=survey, user=user)
+            except IntegrityError:  # the same user submitted concurrently
+                passed_survey_cache.add(survey_id=survey.pk, user_id=user.pk)
+            else:
+                passed_survey_cache.add(survey_id=survey.pk, user_id=user.pk)
+                status = HTTP_202_ACCEPTED if self.is_async_ingest() else HTTP_200_OK
+                return Response(data=serializer.data.get('answers'), status=status)
 
         return Response(data={'msg': "You've already taken this survey"}, status=HTTP_403_FORBIDDEN)
 
 
-class ShowStatisticOfSurvey(generics.RetrieveAPIView):
-    queryset = Survey.objects.all()
-    serializer_class = serializers.SurveyStatisticSerializer
+class ShowStatisticOfSurvey(ConditionalGetMixin, generics.RetrieveAPIView):
+    queryset = Survey.objects.prefetch_related(QUESTION_TREE)
+    serializer_class = serializers.SurveyStatisticReadSerializer
     permission_classes = (IsAuthenticated, IsOwnerOfSurvey)
     lookup_field = 'slug'
     lookup_url_kwarg = 'slug'
 
+    def get_validators(self):
+        """
+        When the survey last changed with its submissions counter and when that changed, in one narrow query.
+        """
+        counters = (Survey.objects.filter(slug=self.kwargs.get('slug'))
+                    .values_list('changed_at', 'passed_count', 'counted_at').first())
+        if counters is None:
+            return None
+        changed_at, passed_count, counted_at = counters
+        changed = int(changed_at.timestamp() * 10 ** 6)
+        counted = int(counted_at.timestamp() * 10 ** 6) if counted_at else 0
+        return quote_etag(f'{changed}-{passed_count}-{counted}'), max(changed, counted) // 10 ** 6
+
+
+class SurveyStatisticQueryAPIView(generics.GenericAPIView):
+    """
+    Answer distributions and cross tabulations of the survey among the submissions matching the filters,
+    see StatisticQuerySerializer for the parameters.
+    """
+    queryset = Survey.objects.only('pk', 'slug', 'owner_id', 'title', 'description', 'schema')
+    permission_classes = (IsAuthenticated, IsOwnerOfSurveyData)
+    lookup_field = 'slug'
+    lookup_url_kwarg = 'slug'
+
+    def get(self, request, *args, **kwargs):
+        survey = self.get_object()
+        serializer = serializers.StatisticQuerySerializer(data=request.query_params, context={'survey': survey})
+        serializer.is_valid(raise_exception=True)
+        query = serializer.validated_data
+        return Response(data=survey_statistics(survey=survey, questions=query.get('question'),
+                                               crosstabs=query.get('crosstab'), answers=query.get('answer'),
+                                               since=query.get('since'), until=query.get('until')))
+
+
+class SurveyTimeSeriesAPIView(generics.GenericAPIView):
+    """
+    Responses and answer selections of the survey per hour or day, served from the rollups, which lag
+    behind the submissions until the next rollup_responses run.
+    """
+    queryset = Survey.objects.only('pk', 'slug', 'owner_id')
+    permission_classes = (IsAuthenticated, IsOwnerOfSurveyData)
+    lookup_field = 'slug'
+    lookup_url_kwarg = 'slug'
+
+    def get(self, request, *args, **kwargs):
+        survey = self.get_object()
+        serializer = serializers.TimeSeriesQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        query = serializer.validated_data
+        return Response(data=response_timeseries(survey=survey, period=query.get('period'),
+                                                 since=query.get('since'), until=query.get('until')))
+
+
+class ExportSurveyResponsesAPIView(generics.GenericAPIView):
+    """
+    Streams the raw responses of the survey as ?output=csv (default) or ?output=ndjson.
+    """
+    queryset = Survey.objects.only('pk', 'slug', 'owner_id')
+    permission_classes = (IsAuthenticated, IsOwnerOfSurveyData)
+    lookup_field = 'slug'
+    lookup_url_kwarg = 'slug'
+
+    def get(self, request, *args, **kwargs):
+        survey = self.get_object()
+        output = request.query_params.get('output', 'csv')
+        if output not in EXPORT_FORMATS:
+            return Response(data={'output': f'Choose one of: {", ".join(EXPORT_FORMATS)}'},
+                            status=HTTP_400_BAD_REQUEST)
+        lines, content_type = EXPORT_FORMATS[output]
+        response = StreamingHttpResponse(lines(response_rows(survey=survey)), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{survey.slug}.{output}"'
+        return response
+
 
 # question
 class QuestionCreateAPIView(generics.CreateAPIView):